@@ -1,91 +1,221 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from prophet import Prophet
 from datetime import datetime, timedelta
-from statsmodels.tsa.arima.model import ARIMA
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-import json
+import os
+import time
+import importlib
 import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from cache import cached, result_cache
+from profiling import profiled
+from importer import CSVImporter
+from model_store import model_store
+from jobs import FORECAST_WORKERS
+from segmentation import segmentation_service
+from sketches import ColumnSketch
+from scenarios import Scenario, ScenarioEngine, SCENARIO_PRESETS, SCENARIO_LOOKBACK_DAYS
+from rollups import ensure_sales_rollups, refresh_sales_rollups
+from database import Customer, Sale, SalesDaily, SalesRollup
+from sqlalchemy import select, update, func, case, and_, or_
 
 logger = logging.getLogger(__name__)
 
+# Forecasting backends are imported on first use (and by prewarm_backends) so that
+# importing this module stays fast for pages that never forecast or cluster
+ANALYTICS_BACKENDS = [
+    'prophet',
+    'statsmodels.tsa.arima.model',
+    'statsmodels.tsa.exponential_smoothing.ets',
+    'sklearn.cluster',
+    'sklearn.preprocessing'
+]
+ANALYTICS_PREWARM = os.getenv("ANALYTICS_PREWARM", "1") == "1"  # import backends in the background after the first render
+
+# Each forecast job worker (FORECAST_WORKERS of them) gets its share of the CPUs for
+# ensemble members; with a share of one, members are fitted one after another
+ENSEMBLE_WORKERS = int(os.getenv("ENSEMBLE_WORKERS", str(max(1, (os.cpu_count() or 1) // FORECAST_WORKERS))))
+DEFAULT_ENSEMBLE_MEMBERS = {'prophet': None, 'arima': None}
+
+# Forecast series frequencies and the season length used for each
+SERIES_FREQUENCIES = {'D': 'D', 'W': 'W-SUN', 'M': 'MS'}
+SEASON_LENGTHS = {'D': 7, 'W-SUN': 52, 'MS': 12}
+
+_ensemble_executor = None
+_ensemble_lock = threading.Lock()
+
+def _get_ensemble_executor():
+    global _ensemble_executor
+    with _ensemble_lock:
+        if _ensemble_executor is None:
+            _ensemble_executor = ProcessPoolExecutor(
+                max_workers=ENSEMBLE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _ensemble_executor
+
+def _reset_ensemble_executor():
+    global _ensemble_executor
+    with _ensemble_lock:
+        if _ensemble_executor is not None:
+            _ensemble_executor.shutdown(wait=False, cancel_futures=True)
+        _ensemble_executor = None
+
+_prewarm_thread = None
+_prewarm_lock = threading.Lock()
+
+def _import_backends():
+    started = time.perf_counter()
+    for name in ANALYTICS_BACKENDS:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Could not pre-import {name}: {str(e)}")
+    logger.info(f"Analytics backends imported in {time.perf_counter() - started:.1f}s")
+
+def prewarm_backends():
+    """Import the forecasting and clustering backends on a daemon thread, once per process"""
+    global _prewarm_thread
+    with _prewarm_lock:
+        if _prewarm_thread is None:
+            _prewarm_thread = threading.Thread(target=_import_backends, name='analytics-prewarm', daemon=True)
+            _prewarm_thread.start()
+    return _prewarm_thread
+
+def _forecast_member(model_type, df, periods, params):
+    """Process pool entry point for a single ensemble member"""
+    return DataAnalytics(None)._run_forecaster(model_type, df, periods, params)
+
 class DataAnalytics:
     def __init__(self, db_session):
         self.db = db_session
 
-    def import_csv_data(self, file_path, table_name):
+    def import_csv_data(self, file_path, table_name, progress=None):
         """Import data from CSV file into specified table"""
         try:
-            df = pd.read_csv(file_path)
-            if table_name == 'motorcycles':
-                df.to_sql('motorcycles', self.db.bind, if_exists='append', index=False)
-            elif table_name == 'customers':
-                df.to_sql('customers', self.db.bind, if_exists='append', index=False)
-            elif table_name == 'sales':
-                df.to_sql('sales', self.db.bind, if_exists='append', index=False)
-            elif table_name == 'market_data':
-                df.to_sql('market_data', self.db.bind, if_exists='append', index=False)
-            logger.info(f"Successfully imported data to {table_name}")
+            result = CSVImporter(self.db.bind, progress=progress).import_file(file_path, table_name)
+            return self._after_import(table_name, result)
         except Exception as e:
             logger.error(f"Error importing data: {str(e)}")
             raise
 
+    def import_columnar_data(self, file, table_name, fmt='parquet', progress=None):
+        """Import a Parquet or Arrow IPC file into specified table"""
+        from columnar import import_table  # pyarrow is loaded on first use
+
+        try:
+            result = import_table(self.db.bind, file, table_name, fmt=fmt, progress=progress)
+            return self._after_import(table_name, result)
+        except Exception as e:
+            logger.error(f"Error importing data: {str(e)}")
+            raise
+
+    def _ensure_rollups(self):
+        """Catch the sales rollups up, checking on this run's session connection"""
+        if ensure_sales_rollups(self.db.bind, conn=self.db.connection()):
+            # Refreshed on another connection; end this session's transaction so
+            # its reads see the new rows under REPEATABLE READ (MySQL's default)
+            self.db.commit()
+
+    def _after_import(self, table_name, result):
+        if table_name == 'sales' and result.rows:
+            refresh_sales_rollups(self.db.bind, since=result.first_date)
+        result_cache.invalidate(table_name)
+        logger.info(f"Successfully imported data to {table_name}")
+        return result
+
+    @profiled('analytics')
+    @cached('sales')
     def statistical_analysis(self, data_type):
         """Perform statistical analysis on different data types"""
         if data_type == 'sales':
-            sales_df = pd.read_sql('SELECT * FROM sales', self.db.bind)
+            self._ensure_rollups()
+            year_ago = (datetime.now() - timedelta(days=365)).date()
+            conn = self.db.connection()
+            totals = conn.execute(select(
+                func.sum(SalesRollup.sales_amount).label('revenue'),
+                func.sum(SalesRollup.transactions).label('transactions'),
+                func.sum(case(
+                    (SalesRollup.date <= year_ago, SalesRollup.sales_amount),
+                    else_=0
+                )).label('revenue_year_ago')
+            )).one()
+            top_regions = conn.execute(
+                select(SalesRollup.sales_region, func.sum(SalesRollup.sales_amount))
+                .group_by(SalesRollup.sales_region)
+                .order_by(func.sum(SalesRollup.sales_amount).desc())
+                .limit(5)
+            ).all()
+
+            revenue = totals.revenue or 0
             analysis = {
-                'total_revenue': sales_df['sales_amount'].sum(),
-                'avg_transaction': sales_df['sales_amount'].mean(),
-                'sales_growth': self._calculate_growth_rate(sales_df, 'sales_amount'),
-                'seasonal_patterns': self._analyze_seasonality(sales_df),
-                'top_regions': sales_df.groupby('sales_region')['sales_amount'].sum().nlargest(5).to_dict()
+                'total_revenue': revenue,
+                'avg_transaction': revenue / totals.transactions if totals.transactions else 0,
+                'sales_growth': self._calculate_growth_rate(revenue, totals.revenue_year_ago),
+                'seasonal_patterns': self._analyze_seasonality(self.get_sales_series('D')),
+                'top_regions': dict(top_regions)
             }
             return analysis
 
+    @profiled('analytics')
+    @cached('customers')
     def customer_segmentation(self):
-        """Perform customer segmentation using K-means clustering"""
-        customer_df = pd.read_sql('SELECT * FROM customers', self.db.bind)
-        features = ['lifetime_value', 'purchases', 'satisfaction_score']
-
-        scaler = StandardScaler()
-        scaled_features = scaler.fit_transform(customer_df[features])
-
-        kmeans = KMeans(n_clusters=4, random_state=42)
-        customer_df['segment'] = kmeans.fit_predict(scaled_features)
-
-        segments = {
-            'high_value': customer_df[customer_df['segment'] == 0].shape[0],
-            'medium_value': customer_df[customer_df['segment'] == 1].shape[0],
-            'low_value': customer_df[customer_df['segment'] == 2].shape[0],
-            'at_risk': customer_df[customer_df['segment'] == 3].shape[0]
-        }
-        return segments
-
-    def sales_forecast(self, periods=30, model_type='prophet', params=None):
+        """Customer counts per value tier, labelling new customers incrementally"""
+        if segmentation_service.refresh(self.db.bind, conn=self.db.connection()):
+            result_cache.invalidate('customers')
+            self.db.commit()  # labelled on other connections; see _ensure_rollups
+        return segmentation_service.segment_counts(self.db.connection())
+
+    @profiled('analytics')
+    @cached('sales')
+    def get_sales_series(self, freq='D'):
+        """Sales totals per day ('D'), week ('W') or month ('M') from the sales_daily rollup"""
+        self._ensure_rollups()
+        daily = pd.read_sql(
+            select(SalesDaily.date, SalesDaily.sales_amount).order_by(SalesDaily.date),
+            self.db.connection(),
+            parse_dates=['date']
+        )
+        # Resampling also fills days without sales with zero
+        series = daily.set_index('date')['sales_amount'].resample(SERIES_FREQUENCIES[freq]).sum()
+        return series.reset_index()
+
+    @profiled('analytics')
+    def sales_forecast(self, periods=30, model_type='prophet', params=None, freq='D'):
         """Generate sales forecast using multiple models"""
         try:
-            sales_df = pd.read_sql(
-                'SELECT date, sales_amount FROM sales ORDER BY date',
-                self.db.bind
-            )
+            sales_df = self.get_sales_series(freq)
 
-            if model_type == 'prophet':
-                return self._prophet_forecast(sales_df, periods, params)
-            elif model_type == 'arima':
-                return self._arima_forecast(sales_df, periods, params)
-            elif model_type == 'ensemble':
-                return self._ensemble_forecast(sales_df, periods, params)
-            else:
-                raise ValueError(f"Unknown model type: {model_type}")
+            return self._run_forecaster(model_type, sales_df, periods, params)
 
         except Exception as e:
             logger.error(f"Forecasting error: {str(e)}")
             raise
 
+    def _run_forecaster(self, model_type, df, periods, params=None):
+        forecasters = {
+            'prophet': self._prophet_forecast,
+            'arima': self._arima_forecast,
+            'ets': self._ets_forecast,
+            'seasonal_naive': self._seasonal_naive_forecast,
+            'ensemble': self._ensemble_forecast
+        }
+        if model_type not in forecasters:
+            raise ValueError(f"Unknown model type: {model_type}")
+        return forecasters[model_type](df, periods, params)
+
+    def _series_freq(self, df):
+        """Frequency alias of a regular date series, defaulting to daily"""
+        if len(df) >= 3:
+            return pd.infer_freq(pd.DatetimeIndex(df['date'])) or 'D'
+        return 'D'
+
+    def _future_dates(self, df, periods):
+        start = pd.Timestamp(df['date'].max())
+        return pd.date_range(start, periods=periods + 1, freq=self._series_freq(df))[1:].tolist()
+
     def _prophet_forecast(self, df, periods, params=None):
         """Prophet model forecasting"""
         df_prophet = df.rename(columns={'date': 'ds', 'sales_amount': 'y'})
@@ -99,11 +229,16 @@ class DataAnalytics:
         if params:
             model_params.update(params)
 
-        model = Prophet(**model_params)
-        model.add_country_holidays(country_name='US')
-        model.fit(df_prophet)
+        def fit():
+            from prophet import Prophet
+            model = Prophet(**model_params)
+            model.add_country_holidays(country_name='US')
+            model.fit(df_prophet)
+            return model
 
-        future_dates = model.make_future_dataframe(periods=periods)
+        model = model_store.get_or_fit('prophet', df_prophet[['ds', 'y']], model_params, fit)
+
+        future_dates = model.make_future_dataframe(periods=periods, freq=self._series_freq(df))
         forecast = model.predict(future_dates)
 
         # Calculate performance metrics
@@ -123,8 +258,11 @@ class DataAnalytics:
         """ARIMA model forecasting"""
         model_params = {'order': (1, 1, 1)} if not params else params
 
-        model = ARIMA(df['sales_amount'].values, **model_params)
-        results = model.fit()
+        def fit():
+            from statsmodels.tsa.arima.model import ARIMA
+            return ARIMA(df['sales_amount'].values, **model_params).fit()
+
+        results = model_store.get_or_fit('arima', df[['date', 'sales_amount']], model_params, fit)
 
         forecast = results.forecast(steps=periods)
         conf_int = results.get_forecast(steps=periods).conf_int()
@@ -135,115 +273,300 @@ class DataAnalytics:
         metrics = self._calculate_metrics(y_true, y_pred)
 
         return {
-            'dates': [df['date'].max() + timedelta(days=i) for i in range(1, periods + 1)],
+            'dates': self._future_dates(df, periods),
             'predictions': forecast.tolist(),
             'lower_bound': conf_int[:, 0].tolist(),
             'upper_bound': conf_int[:, 1].tolist(),
             'metrics': metrics
         }
 
-    def _ensemble_forecast(self, df, periods, params=None):
-        """Ensemble forecasting combining multiple models"""
-        prophet_forecast = self._prophet_forecast(df, periods, params)
-        arima_forecast = self._arima_forecast(df, periods, params)
-
-        # Simple average ensemble
-        predictions = np.mean([
-            prophet_forecast['predictions'],
-            arima_forecast['predictions']
-        ], axis=0)
-
-        lower_bound = np.mean([
-            prophet_forecast['lower_bound'],
-            arima_forecast['lower_bound']
-        ], axis=0)
-
-        upper_bound = np.mean([
-            prophet_forecast['upper_bound'],
-            arima_forecast['upper_bound']
-        ], axis=0)
+    def _ets_forecast(self, df, periods, params=None):
+        """Exponential smoothing (ETS) state space model forecasting"""
+        model_params = {
+            'error': 'add',
+            'trend': 'add',
+            'seasonal': 'add',
+            'seasonal_periods': SEASON_LENGTHS.get(self._series_freq(df), 7)
+        }
+        if params:
+            model_params.update(params)
+
+        y = df['sales_amount'].astype(float).reset_index(drop=True)
+
+        def fit():
+            from statsmodels.tsa.exponential_smoothing.ets import ETSModel
+            return ETSModel(y, **model_params).fit(disp=False)
+
+        results = model_store.get_or_fit('ets', df[['date', 'sales_amount']], model_params, fit)
+
+        prediction = results.get_prediction(start=len(y), end=len(y) + periods - 1).summary_frame()
+        metrics = self._calculate_metrics(y.values, np.asarray(results.fittedvalues))
+
+        return {
+            'dates': self._future_dates(df, periods),
+            'predictions': prediction['mean'].tolist(),
+            'lower_bound': prediction['pi_lower'].tolist(),
+            'upper_bound': prediction['pi_upper'].tolist(),
+            'metrics': metrics
+        }
+
+    def _seasonal_naive_forecast(self, df, periods, params=None):
+        """Seasonal naive forecasting: repeat the last observed season"""
+        season = (params or {}).get('season_length', SEASON_LENGTHS.get(self._series_freq(df), 7))
+        y = df['sales_amount'].astype(float).values
+        if len(y) <= season:
+            raise ValueError(f"Seasonal naive forecast needs more than {season} observations")
+
+        last_season = y[-season:]
+        predictions = np.resize(last_season, periods)
+
+        # Prediction interval widens with the number of seasons ahead
+        residuals = y[season:] - y[:-season]
+        seasons_ahead = np.arange(periods) // season + 1
+        margin = 1.96 * residuals.std() * np.sqrt(seasons_ahead)
 
         return {
-            'dates': prophet_forecast['dates'],
+            'dates': self._future_dates(df, periods),
             'predictions': predictions.tolist(),
-            'lower_bound': lower_bound.tolist(),
-            'upper_bound': upper_bound.tolist(),
-            'metrics': {
-                'prophet': prophet_forecast['metrics'],
-                'arima': arima_forecast['metrics']
-            }
+            'lower_bound': (predictions - margin).tolist(),
+            'upper_bound': (predictions + margin).tolist(),
+            'metrics': self._calculate_metrics(y[season:], y[:-season])
         }
 
+    def _ensemble_forecast(self, df, periods, params=None):
+        """Ensemble forecasting combining multiple models fitted in parallel.
+
+        params may give per-member parameters and weights, e.g.
+        {'members': {'prophet': {...}, 'arima': {'order': (2, 1, 1)}, 'ets': None},
+         'weights': {'prophet': 2, 'arima': 1, 'ets': 1}}
+        """
+        params = params or {}
+        members = params.get('members') or DEFAULT_ENSEMBLE_MEMBERS
+        weights = params.get('weights') or {}
+        if 'ensemble' in members:
+            raise ValueError("An ensemble cannot contain another ensemble")
+
+        member_weights = [float(weights.get(name, 1.0)) for name in members]
+        if any(weight < 0 for weight in member_weights):
+            raise ValueError("Ensemble weights cannot be negative")
+        if sum(member_weights) <= 0:
+            logger.warning("All ensemble weights are zero; averaging members equally")
+            member_weights = [1.0] * len(member_weights)
+
+        forecasts = self._fit_members(df, periods, members)
+
+        def combine(field):
+            values = [forecast[field] for forecast in forecasts.values()]
+            return np.average(values, axis=0, weights=member_weights).tolist()
+
+        first = next(iter(forecasts.values()))
+        return {
+            'dates': first['dates'],
+            'predictions': combine('predictions'),
+            'lower_bound': combine('lower_bound'),
+            'upper_bound': combine('upper_bound'),
+            'metrics': {name: forecast['metrics'] for name, forecast in forecasts.items()}
+        }
+
+    def _fit_members(self, df, periods, members):
+        """Fit ensemble members concurrently, one process per member up to ENSEMBLE_WORKERS"""
+        if len(members) == 1 or ENSEMBLE_WORKERS <= 1:
+            return {name: self._run_forecaster(name, df, periods, member_params)
+                    for name, member_params in members.items()}
+        try:
+            executor = _get_ensemble_executor()
+            futures = {
+                name: executor.submit(_forecast_member, name, df, periods, member_params)
+                for name, member_params in members.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
+        except BrokenProcessPool as e:
+            logger.warning(f"Ensemble worker pool failed ({str(e)}), fitting members sequentially")
+            _reset_ensemble_executor()
+            return {name: self._run_forecaster(name, df, periods, member_params)
+                    for name, member_params in members.items()}
+
     def _calculate_metrics(self, y_true, y_pred):
         """Calculate forecast performance metrics"""
+        y_true = np.asarray(y_true, dtype=float)
+        y_pred = np.asarray(y_pred, dtype=float)
+        # Periods without sales are excluded from MAPE to avoid dividing by zero
+        nonzero = y_true != 0
         return {
-            'mae': mean_absolute_error(y_true, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_true, y_pred)),
-            'mape': np.mean(np.abs((y_true - y_pred) / y_true)) * 100
+            'mae': np.mean(np.abs(y_true - y_pred)),
+            'rmse': np.sqrt(np.mean((y_true - y_pred) ** 2)),
+            'mape': np.mean(np.abs((y_true[nonzero] - y_pred[nonzero]) / y_true[nonzero])) * 100
         }
 
+    @profiled('analytics')
+    @cached('sales')
+    def get_scenario_cube(self, days=SCENARIO_LOOKBACK_DAYS):
+        """Baseline sales per region x channel over the last `days` days of the rollup"""
+        self._ensure_rollups()
+        conn = self.db.connection()
+        latest = conn.scalar(select(func.max(SalesRollup.date)))
+        dimensions = [SalesRollup.sales_region, SalesRollup.sales_channel]
+        stmt = select(
+            *dimensions,
+            func.sum(SalesRollup.sales_amount).label('sales_amount'),
+            func.sum(SalesRollup.units_sold).label('units_sold')
+        ).group_by(*dimensions)
+        if latest is not None:
+            stmt = stmt.where(SalesRollup.date > latest - timedelta(days=days))
+        return pd.read_sql(stmt, conn)
+
+    @profiled('analytics')
     def what_if_analysis(self, scenario):
-        """Perform what-if analysis based on different scenarios"""
-        base_sales = pd.read_sql('SELECT * FROM sales', self.db.bind)
-
-        if scenario == 'price_increase':
-            impact = {
-                'revenue_change': base_sales['sales_amount'].sum() * 1.1,
-                'demand_change': base_sales['units_sold'].sum() * 0.9,
-                'profit_margin': 'Increased by 5%'
-            }
-        elif scenario == 'marketing_boost':
-            impact = {
-                'revenue_change': base_sales['sales_amount'].sum() * 1.15,
-                'customer_acquisition': 'Increased by 20%',
-                'roi': '12% on marketing spend'
-            }
-        return impact
+        """Simulate a Scenario (or a SCENARIO_PRESETS name) against the baseline sales cube"""
+        if isinstance(scenario, str):
+            scenario = SCENARIO_PRESETS[scenario]
+        return ScenarioEngine(self.get_scenario_cube()).simulate(scenario)
+
+    @profiled('analytics')
+    def what_if_grid(self, scenario, price_changes, uplifts):
+        """Expected revenue change (%) and P(revenue up) over a price change x uplift grid"""
+        return ScenarioEngine(self.get_scenario_cube()).grid(scenario, price_changes, uplifts)
 
-    def _calculate_growth_rate(self, df, column):
+    def _calculate_growth_rate(self, current, previous):
         """Calculate year-over-year growth rate"""
-        df['date'] = pd.to_datetime(df['date'])
-        current = df[column].sum()
-        previous = df[df['date'] <= datetime.now() - timedelta(days=365)][column].sum()
         return (current - previous) / previous * 100 if previous else 0
 
     def _analyze_seasonality(self, df):
         """Analyze seasonal patterns in data"""
-        monthly_sales = df.set_index('date').resample('M')['sales_amount'].sum()
+        monthly_sales = df.set_index('date').resample('ME')['sales_amount'].sum()
         return monthly_sales.to_dict()
 
 
+# Churn scoring windows (days) and the minimum score of each risk level
+CHURN_RECENT_DAYS = 90
+CHURN_LAPSED_DAYS = 180
+CHURN_FREQUENCY_DAYS = 365
+CHURN_RISK_LEVELS = [('High', 60), ('Medium', 30), ('Low', 0)]
+CHURN_BATCH_SIZE = int(os.getenv("CHURN_BATCH_SIZE", "10000"))
+
+def _churn_score(last_purchase, recent_purchases, satisfaction, today):
+    """0-100 churn score SQL expression from recency, frequency and satisfaction"""
+    recency = case(
+        (or_(last_purchase.is_(None), last_purchase < today - timedelta(days=CHURN_LAPSED_DAYS)), 40),
+        (last_purchase < today - timedelta(days=CHURN_RECENT_DAYS), 20),
+        else_=0
+    )
+    frequency = case(
+        (func.coalesce(recent_purchases, 0) == 0, 30),
+        (recent_purchases == 1, 15),
+        else_=0
+    )
+    dissatisfaction = case(
+        (or_(satisfaction.is_(None), satisfaction < 3.5), 30),
+        (satisfaction < 4.0, 15),
+        else_=0
+    )
+    return recency + frequency + dissatisfaction
+
+def _churn_risk_level(score):
+    return case(*[(score >= minimum, level) for level, minimum in CHURN_RISK_LEVELS[:-1]],
+                else_=CHURN_RISK_LEVELS[-1][0])
+
+CLV_PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+# Process-wide approximate quantiles of customers.lifetime_value
+clv_sketch = ColumnSketch(Customer.lifetime_value, Customer.id)
+
 class CRMAnalytics:
     def __init__(self, db_session):
         self.db = db_session
 
-    def customer_lifetime_value(self):
-        """Calculate and analyze customer lifetime value"""
-        customer_df = pd.read_sql('SELECT * FROM customers', self.db.bind)
-
-        print("Columns in customer_df:", customer_df.columns) 
-        
-            # Combine first and last name into a 'name' column (if these columns exist)
-        if 'first_name' in customer_df.columns and 'last_name' in customer_df.columns:
-            customer_df['name'] = customer_df['first_name'] + ' ' + customer_df['last_name']
-        elif 'customer_name' in customer_df.columns: # Or if it's 'customer_name'
-            customer_df = customer_df.rename(columns={'customer_name': 'name'}) # Rename to 'name'
-        else:
-            logger.warning("No valid name column found in customer_df.")
-            customer_df['name'] = 'Unknown'  # Assign a default value if no names are available
-            
+    @profiled('analytics')
+    @cached('customers')
+    def customer_lifetime_value(self, top_n=10):
+        """Average and percentile CLV plus the top customers, without reading the whole table"""
+        conn = self.db.connection()
+        count, average, digest = clv_sketch.stats(conn)
+        top = conn.execute(
+            select(Customer.id, Customer.first_name, Customer.last_name, Customer.lifetime_value)
+            .where(Customer.lifetime_value.is_not(None))
+            .order_by(Customer.lifetime_value.desc())
+            .limit(top_n)
+        ).all()
+
         clv_analysis = {
-            'average_clv': customer_df['lifetime_value'].mean(),
-            'median_clv': customer_df['lifetime_value'].median(),
-            'top_customers': customer_df.nlargest(10, 'lifetime_value')[['name', 'lifetime_value']].to_dict()
+            'customers': count,
+            'average_clv': average,
+            'median_clv': digest.quantile(0.5),
+            'percentiles': {q: digest.quantile(q) for q in CLV_PERCENTILES},
+            'top_customers': [
+                {
+                    'id': row.id,
+                    'name': ' '.join(part for part in (row.first_name, row.last_name) if part) or 'Unknown',
+                    'lifetime_value': row.lifetime_value
+                }
+                for row in top
+            ]
         }
         return clv_analysis
 
+    @profiled('analytics')
+    @cached('customers', 'sales')
     def churn_risk_analysis(self):
-        """Identify customers at risk of churning"""
-        customers = pd.read_sql('''
-            SELECT c.id, c.first_name, c.last_name, c.email, c.phone, c.lifetime_value, c.purchases, c.satisfaction_score, COUNT(s.id) as recent_purchases
-            FROM customers c
-            LEFT JOIN sales s ON c.id = s.customer_id
-            GROUP BY c.id, c.first_name, c.last_name, c.email, c.phone, c.lifetime_value, c.purchases, c.satisfaction_score
-        ''', self.db)
+        """Number of customers per churn risk level, scored and counted in the database"""
+        today = datetime.now().date()
+        activity = (
+            select(
+                Sale.customer_id,
+                func.max(Sale.date).label('last_purchase'),
+                func.sum(case((Sale.date >= today - timedelta(days=CHURN_FREQUENCY_DAYS), 1), else_=0)).label('recent_purchases')
+            )
+            .group_by(Sale.customer_id)
+            .subquery()
+        )
+        score = _churn_score(activity.c.last_purchase, activity.c.recent_purchases, Customer.satisfaction_score, today)
+        scored = (
+            select(_churn_risk_level(score).label('risk_level'))
+            .select_from(Customer)
+            .outerjoin(activity, activity.c.customer_id == Customer.id)
+            .subquery()
+        )
+        rows = self.db.execute(
+            select(scored.c.risk_level, func.count()).group_by(scored.c.risk_level)
+        ).all()
+        counts = dict(rows)
+        return {level: int(counts.get(level, 0)) for level, _ in CHURN_RISK_LEVELS}
+
+    @profiled('analytics')
+    def score_churn_risk(self, batch_size=CHURN_BATCH_SIZE):
+        """Write customers.churn_risk_score in id-range batches; return the number of customers scored.
+
+        Each batch is a single UPDATE with correlated subqueries on sales, so no
+        customer rows leave the database. Batches commit separately to keep
+        lock times short on large tables.
+        """
+        today = datetime.now().date()
+        last_purchase = select(func.max(Sale.date)).where(Sale.customer_id == Customer.id).scalar_subquery()
+        recent_purchases = (
+            select(func.count(Sale.id))
+            .where(Sale.customer_id == Customer.id, Sale.date >= today - timedelta(days=CHURN_FREQUENCY_DAYS))
+            .scalar_subquery()
+        )
+        score = _churn_score(last_purchase, recent_purchases, Customer.satisfaction_score, today)
+
+        bind = self.db.bind
+        scored = 0
+        last_id = 0
+        while True:
+            with bind.begin() as conn:
+                # Upper id of this batch, or None for the final partial batch
+                batch_end = conn.scalar(
+                    select(Customer.id).where(Customer.id > last_id)
+                    .order_by(Customer.id).offset(batch_size - 1).limit(1)
+                )
+                in_batch = Customer.id > last_id
+                if batch_end is not None:
+                    in_batch = and_(in_batch, Customer.id <= batch_end)
+                scored += conn.execute(update(Customer).where(in_batch).values(churn_risk_score=score)).rowcount
+            if batch_end is None:
+                break
+            last_id = batch_end
+
+        result_cache.invalidate('customers')
+        logger.info(f"Scored churn risk for {scored} customers")
+        return scored
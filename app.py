@@ -1,16 +1,22 @@
 import os
+import time
+import tempfile
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from database import get_db, init_db
+from database import get_db, init_db, session_scope, pool_status, SessionLocal
 from data_generator import populate_database
 from models import MotorcycleDSS, Motorcycle, User
-from analytics import DataAnalytics, CRMAnalytics
-from utils import create_sales_trend_chart, create_inventory_pie_chart, create_customer_satisfaction_gauge, export_to_csv
+from analytics import DataAnalytics, CRMAnalytics, ANALYTICS_PREWARM, prewarm_backends
+from jobs import get_job_runner
+from scenarios import Scenario, SCENARIO_PRESETS
+from utils import create_sales_trend_chart, create_inventory_pie_chart, create_customer_satisfaction_gauge, export_to_csv, stream_table_csv, ExportTooLarge, EXPORT_MAX_BYTES
 import logging
-import bcrypt # Import bcrypt for password hashing
+from auth import AuthBusy, hash_password, check_password, client_ip, login_rate_limiter
+from instrumentation import query_stats, current_page, SLOW_QUERY_MS
+from profiling import profile_mode, profile_phase, start_render, finish_render, page_timings
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError # Import IntegrityError for handling duplicate entries
 
@@ -26,6 +32,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Phase timings for this run when profiling is on (PROFILE_PAGES or ?profile=1|cprofile|pyinstrument)
+render_profile = start_render(profile_mode(st.query_params.get('profile')))
+
 # Initialize session state for authentication
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -148,7 +157,7 @@ def get_user_by_username(db: Session, username: str):
 
 
 def create_user(db: Session, username: str, password: str, role: str = 'user'):
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = hash_password(password)
     db_user = User(username=username, hashed_password=hashed_password,)
     db.add(db_user)
     db.commit()
@@ -156,11 +165,16 @@ def create_user(db: Session, username: str, password: str, role: str = 'user'):
     return db_user
 
 def verify_password(plain_password, hashed_password):
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return check_password(plain_password, hashed_password)
+
+def client_address():
+    """Best-effort client IP for login rate limiting; X-Forwarded-For counts only from TRUSTED_PROXIES"""
+    return client_ip(getattr(st.context, 'ip_address', None), st.context.headers.get('X-Forwarded-For', ''))
 
 def login(db: Session, username, password):
     user = get_user_by_username(db, username)
     if user and verify_password(password, user.hashed_password):
+        login_rate_limiter.reset(username)
         st.session_state.authenticated = True
         st.session_state.username = username
         return True
@@ -175,14 +189,26 @@ def auth_page():
         login_username = st.text_input("Username")
         login_password = st.text_input("Password", type="password")
         if st.button("Login"):
-            # Use the initialized db session for login
-            if login(db, login_username, login_password):
+            ip = client_address()
+            retry_after = login_rate_limiter.retry_after(login_username, ip)
+            if retry_after:
+                st.error(f"Too many failed login attempts. Try again in {retry_after:.0f} seconds.")
+                logged_in = None
+            else:
+                try:
+                    # Use the initialized db session for login
+                    logged_in = login(db, login_username, login_password)
+                except AuthBusy as e:
+                    st.warning(str(e))
+                    logged_in = None
+            if logged_in:
                 st.success("Login successful!")
 
                 st.session_state.show_login_page = False
                 st.session_state.authenticated = True
                 st.rerun()
-            else:
+            elif logged_in is not None:
+                login_rate_limiter.record_failure(login_username, ip)
                 st.error("Invalid credentials")
             db.close()
 
@@ -203,6 +229,8 @@ def auth_page():
                 st.rerun()
             except IntegrityError:
                 st.error("Username already taken. Please choose another.")
+            except AuthBusy as e:
+                st.warning(str(e))
             if signup_password != signup_confirm_password:
                 st.error("Passwords do not match.")
             elif len(signup_password) < 6:
@@ -217,6 +245,8 @@ def auth_page():
                     st.rerun()
                 except IntegrityError:
                     st.error("Username already taken. Please choose another.")
+                except AuthBusy as e:
+                    st.warning(str(e))
                 except Exception as e:
                     logger.error(f"Signup error: {str(e)}")
                     st.error(f"Signup failed: {str(e)}")
@@ -229,6 +259,29 @@ def logout():
     st.session_state.username = None
     st.rerun()
 
+@st.fragment(run_every=2)
+def show_forecast_progress(job_id):
+    """Poll a running forecast job and rerun the page once it finishes"""
+    job = get_job_runner().get(job_id)
+    if job is None or job['status'] != 'running':
+        st.rerun()
+    elapsed = time.time() - job['submitted_at']
+    st.info(f"Generating {job['request']['model_type']} forecast... ({elapsed:.0f}s elapsed)")
+
+def model_param_inputs(model_type, key_prefix=""):
+    """Widgets for a forecasting model's parameters; None for models without any"""
+    if model_type == "prophet":
+        return {
+            'yearly_seasonality': st.checkbox("Include Yearly Seasonality", value=True, key=f"{key_prefix}yearly"),
+            'weekly_seasonality': st.checkbox("Include Weekly Seasonality", value=True, key=f"{key_prefix}weekly")
+        }
+    if model_type == "arima":
+        p = st.number_input("AR Order (p)", 0, 5, 1, key=f"{key_prefix}p")
+        d = st.number_input("Difference Order (d)", 0, 2, 1, key=f"{key_prefix}d")
+        q = st.number_input("MA Order (q)", 0, 5, 1, key=f"{key_prefix}q")
+        return {'order': (p, d, q)}
+    return None
+
 # Initialize session state for authentication - simplified
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -252,9 +305,19 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# Initialize session state for dss if it doesn't exist
-if 'dss' not in st.session_state:
-    st.session_state.dss = MotorcycleDSS(next(get_db()))  # Initialize with the actual DSS class
+# One database session per script run, closed at the end of the run so idle
+# browser tabs don't hold pooled connections. A run that ended early
+# (st.stop/st.rerun) leaves its session behind, so close that one first.
+previous_db = st.session_state.pop('db_session', None)
+if previous_db is not None:
+    previous_db.close()
+db = SessionLocal()
+st.session_state.db_session = db
+# Attribute this run's queries to the page being rendered (see instrumentation.py)
+current_page.set(None if st.session_state.authenticated else "Login")
+dss = MotorcycleDSS(db)
+data_analytics = DataAnalytics(db)
+crm_analytics = CRMAnalytics(db)
 
 # Main application logic - Conditionally render auth page or main app
 if not st.session_state.authenticated:
@@ -278,11 +341,12 @@ else:
             populate_database()
 
             # Create default admin user if not exists (for initial setup)
-            db = next(get_db())
-            if not get_user_by_username(db, "admin"):
-                create_user(db, "admin", "admin") # Default admin/admin credentials
-                logger.info("Default admin user created.")
-            db.close()
+            with session_scope() as setup_db:
+                # User lives on models.py's metadata, which init_db doesn't create
+                User.__table__.create(bind=setup_db.bind, checkfirst=True)
+                if not get_user_by_username(setup_db, "admin"):
+                    create_user(setup_db, "admin", "admin") # Default admin/admin credentials
+                    logger.info("Default admin user created.")
 
             st.session_state.db_initialized = True # Mark as initialized
             logger.info("Database initialization complete")
@@ -291,37 +355,15 @@ else:
             st.error("Failed to initialize database. Please check the logs.")
             st.stop()
 
-    try:
-        if 'dss_initialized' not in st.session_state: # Check if DSS models initialized
-            logger.info("Creating database session...")
-            db = next(get_db())
-            logger.info("Database session created successfully")
-            logger.info("Initializing DSS models...")
-            st.session_state.dss = MotorcycleDSS(db) # Store in session state
-            st.session_state.data_analytics = DataAnalytics(db) # Store in session state
-            st.session_state.crm_analytics = CRMAnalytics(db) # Store in session state
-            st.session_state.db_session = db # Store db session for later use if needed
-            st.session_state.dss_initialized = True # Mark DSS models as initialized
-            logger.info("Models initialized successfully")
-        else:
-            db = st.session_state.db_session # Reuse existing session
-            dss = st.session_state.dss
-            data_analytics = st.session_state.data_analytics
-            crm_analytics = st.session_state.crm_analytics
-
-    except Exception as e:
-        logger.error(f"Failed to initialize models: {str(e)}")
-        st.error("Failed to initialize application models. Please check the logs.")
-        st.stop()
-
 # Sidebar navigation with icons (only shown when authenticated)
 st.sidebar.title("Navigation")
-page = st.sidebar.selectbox(
-    "Select Page",
-    ["🏠 Home", "📊 Dashboard", "📦 Inventory", "💰 Sales", 
-     "👥 Customers", "📈 Market", "🔮 Forecast", 
-     "🎯 What-If", "📥 Data"]
-)
+pages = ["🏠 Home", "📊 Dashboard", "📦 Inventory", "💰 Sales", 
+         "👥 Customers", "📈 Market", "🔮 Forecast", 
+         "🎯 What-If", "📥 Data"]
+if st.session_state.username == "admin":
+    pages.append("🛠️ Admin")
+page = st.sidebar.selectbox("Select Page", pages)
+current_page.set(page.split(' ', 1)[-1])
 # User Profile Display in Sidebar
 if st.session_state.authenticated:
     st.sidebar.markdown("---") # Separator
@@ -345,17 +387,15 @@ if page == "🏠 Home":
 
     # Quick Stats
     try:
-        metrics = st.session_state.dss.get_inventory_metrics()
-        sales = st.session_state.dss.get_sales_metrics()
-        customers = st.session_state.dss.get_customer_metrics()
+        kpis = dss.get_kpi_snapshot()
 
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.info(f"📦 {metrics['total_inventory']} Motorcycles in Stock")
+            st.info(f"📦 {kpis.total_inventory} Motorcycles in Stock")
         with col2:
-            st.info(f"💰 ${sales['total_sales']:,.0f} Total Sales")
+            st.info(f"💰 ${kpis.total_sales:,.0f} Total Sales")
         with col3:
-            st.info(f"👥 {customers['total_customers']} Active Customers")
+            st.info(f"👥 {kpis.total_customers} Active Customers")
     except Exception as e:
         logger.error(f"Error loading quick stats: {str(e)}")
         st.warning("Quick stats temporarily unavailable")
@@ -437,9 +477,7 @@ elif page == "📊 Dashboard":
 
     with st.spinner("Loading metrics..."):
         try:
-            inventory_metrics = st.session_state.dss.get_inventory_metrics()
-            sales_metrics = st.session_state.dss.get_sales_metrics()
-            customer_metrics = st.session_state.dss.get_customer_metrics()
+            kpis = dss.get_kpi_snapshot()
 
             # KPI Cards using columns
             col1, col2, col3 = st.columns(3)
@@ -447,54 +485,56 @@ elif page == "📊 Dashboard":
             with col1:
                 st.metric(
                     "Total Inventory",
-                    f"{inventory_metrics['total_inventory']:,}",
+                    f"{kpis.total_inventory:,}",
                     help="Total number of motorcycles in stock"
                 )
                 st.metric(
                     "Average Price",
-                    f"${inventory_metrics['avg_price']:,.2f}",
+                    f"${kpis.avg_price:,.2f}",
                     help="Average price of motorcycles in inventory"
                 )
 
             with col2:
                 st.metric(
                     "Total Sales",
-                    f"${sales_metrics['total_sales']:,.2f}",
+                    f"${kpis.total_sales:,.2f}",
                     help="Total revenue from sales"
                 )
                 st.metric(
                     "Units Sold",
-                    f"{sales_metrics['total_units']:,}",
+                    f"{kpis.total_units:,}",
                     help="Total number of motorcycles sold"
                 )
 
             with col3:
                 st.metric(
                     "Total Customers",
-                    f"{customer_metrics['total_customers']:,}",
+                    f"{kpis.total_customers:,}",
                     help="Total number of unique customers"
                 )
                 st.metric(
                     "Avg. Customer LTV",
-                    f"${customer_metrics['avg_ltv']:,.2f}",
+                    f"${kpis.avg_ltv:,.2f}",
                     help="Average customer lifetime value"
                 )
 
             # Charts
             col1, col2 = st.columns(2)
             with col1:
-                sales_data = st.session_state.dss.get_sales_data()
-                st.plotly_chart(
-                    create_sales_trend_chart(sales_data),
-                    use_container_width=True
-                )
+                sales_data = dss.get_sales_data()
+                with profile_phase('serialize'):
+                    st.plotly_chart(
+                        create_sales_trend_chart(sales_data),
+                        use_container_width=True
+                    )
 
             with col2:
-                inventory_data = st.session_state.dss.get_inventory_data()
-                st.plotly_chart(
-                    create_inventory_pie_chart(inventory_data),
-                    use_container_width=True
-                )
+                inventory_data = dss.get_inventory_data()
+                with profile_phase('serialize'):
+                    st.plotly_chart(
+                        create_inventory_pie_chart(inventory_data),
+                        use_container_width=True
+                    )
 
         except Exception as e:
             logger.error(f"Error loading overview metrics: {str(e)}")
@@ -526,7 +566,7 @@ elif page == "📦 Inventory":
             st.success("Inventory added successfully!")
 
     # Display inventory table
-    inventory_data = st.session_state.dss.get_inventory_data()
+    inventory_data = dss.get_inventory_data()
     st.dataframe(inventory_data)
 
     # Export inventory
@@ -542,7 +582,7 @@ elif page == "💰 Sales":
     st.header("Sales Analytics")
 
     # Statistical Analysis
-    stats = st.session_state.data_analytics.statistical_analysis('sales')
+    stats = data_analytics.statistical_analysis('sales')
 
     col1, col2 = st.columns(2)
     with col1:
@@ -554,38 +594,61 @@ elif page == "💰 Sales":
 
     # Sales Trends
     st.subheader("Sales Trends")
-    sales_data = st.session_state.dss.get_sales_data()
-    st.plotly_chart(create_sales_trend_chart(sales_data))
+    sales_data = data_analytics.get_sales_series('D')
+    with profile_phase('serialize'):
+        st.plotly_chart(create_sales_trend_chart(sales_data))
 
     # Regional Performance
     st.subheader("Top Performing Regions")
     regions_df = pd.DataFrame(list(stats['top_regions'].items()), 
                             columns=['Region', 'Sales'])
-    st.bar_chart(regions_df.set_index('Region'))
+    with profile_phase('serialize'):
+        st.bar_chart(regions_df.set_index('Region'))
 
 elif page == "👥 Customers":
     st.header("Customer Insights")
 
     # Customer Segmentation
-    segments = st.session_state.data_analytics.customer_segmentation()
+    segments = data_analytics.customer_segmentation()
     st.subheader("Customer Segments")
 
     segment_df = pd.DataFrame(list(segments.items()), 
                             columns=['Segment', 'Count'])
-    st.plotly_chart(px.pie(segment_df, values='Count', names='Segment',
-                          title='Customer Segmentation'))
+    with profile_phase('figure'):
+        fig_segments = px.pie(segment_df, values='Count', names='Segment',
+                              title='Customer Segmentation')
+    with profile_phase('serialize'):
+        st.plotly_chart(fig_segments)
 
     # Customer Lifetime Value Analysis
-    clv_data = st.session_state.crm_analytics.customer_lifetime_value()
-    st.metric("Average Customer Lifetime Value", 
-              f"${clv_data['average_clv']:,.2f}")
+    clv_data = crm_analytics.customer_lifetime_value()
+    col1, col2 = st.columns(2)
+    col1.metric("Average Customer Lifetime Value", 
+                f"${clv_data['average_clv']:,.2f}")
+    col2.metric("Median Customer Lifetime Value",
+                f"${clv_data['median_clv']:,.2f}")
+
+    st.subheader("Lifetime Value Distribution")
+    percentile_df = pd.DataFrame({
+        'Percentile': [f"P{q * 100:g}" for q in clv_data['percentiles']],
+        'Lifetime Value': list(clv_data['percentiles'].values())
+    })
+    with profile_phase('serialize'):
+        st.bar_chart(percentile_df.set_index('Percentile'))
+
+    st.subheader("Top Customers by Lifetime Value")
+    with profile_phase('serialize'):
+        st.dataframe(pd.DataFrame(clv_data['top_customers'], columns=['id', 'name', 'lifetime_value'])[['name', 'lifetime_value']]
+                     .rename(columns={'name': 'Customer', 'lifetime_value': 'Lifetime Value'}),
+                     hide_index=True)
 
     # Churn Risk Analysis
-    churn_data = st.session_state.crm_analytics.churn_risk_analysis()
+    churn_data = crm_analytics.churn_risk_analysis()
     st.subheader("Churn Risk Distribution")
     churn_df = pd.DataFrame(list(churn_data.items()),
                            columns=['Risk Level', 'Count'])
-    st.bar_chart(churn_df.set_index('Risk Level'))
+    with profile_phase('serialize'):
+        st.bar_chart(churn_df.set_index('Risk Level'))
 
 elif page == "📈 Market":
     st.header("Market Analysis")
@@ -610,38 +673,66 @@ elif page == "🔮 Forecast":
     with col1:
         model_type = st.selectbox(
             "Select Forecasting Model",
-            ["prophet", "arima", "ensemble"],
+            ["prophet", "arima", "ets", "seasonal_naive", "ensemble"],
             help="Choose the forecasting model to use"
         )
+        freq_label = st.selectbox(
+            "Series Frequency",
+            ["Daily", "Weekly", "Monthly"],
+            help="Sales are summed per period before fitting"
+        )
+        freq = {"Daily": "D", "Weekly": "W", "Monthly": "M"}[freq_label]
         periods = st.slider(
-            "Forecast Periods (Days)", 
+            "Forecast Periods", 
             7, 90, 30,
-            help="Number of days to forecast into the future"
+            help="Number of periods to forecast into the future"
         )
 
     with col2:
-        if model_type == "prophet":
-            yearly_seasonality = st.checkbox("Include Yearly Seasonality", value=True)
-            weekly_seasonality = st.checkbox("Include Weekly Seasonality", value=True)
+        if model_type == "ensemble":
+            members = st.multiselect(
+                "Ensemble Members",
+                ["prophet", "arima", "ets", "seasonal_naive"],
+                default=["prophet", "arima"],
+                help="Members are fitted in parallel worker processes"
+            )
+            member_params, weights = {}, {}
+            for member in members:
+                weights[member] = st.slider(f"{member} weight", 0.0, 1.0, 1.0, 0.1)
+                if member in ("prophet", "arima"):
+                    with st.expander(f"{member} parameters"):
+                        member_params[member] = model_param_inputs(member, key_prefix=f"ensemble_{member}_")
+                else:
+                    member_params[member] = None
+            if members and not any(weights.values()):
+                st.warning("All weights are zero, so the members will be averaged equally.")
             params = {
-                'yearly_seasonality': yearly_seasonality,
-                'weekly_seasonality': weekly_seasonality
-            }
-        elif model_type == "arima":
-            p = st.number_input("AR Order (p)", 0, 5, 1)
-            d = st.number_input("Difference Order (d)", 0, 2, 1)
-            q = st.number_input("MA Order (q)", 0, 5, 1)
-            params = {'order': (p, d, q)}
+                'members': member_params,
+                'weights': weights
+            } if members else None
         else:
-            params = None
-
-    # Generate forecast
-    with st.spinner("Generating forecast..."):
+            params = model_param_inputs(model_type)
+
+    # Forecasts run in background worker processes; the page polls the job
+    if st.button("Generate Forecast"):
+        st.session_state.forecast_job = get_job_runner().submit(periods, model_type, params, freq)
+
+    job_id = st.session_state.get('forecast_job')
+    job = get_job_runner().get(job_id) if job_id else None
+    if job is None:
+        st.info("Choose a model and click Generate Forecast.")
+    elif job['status'] == 'running':
+        show_forecast_progress(job_id)
+    elif job['status'] == 'failed':
+        st.error(f"Error generating forecast: {job['error']}")
+    else:
         try:
-            forecast = st.session_state.data_analytics.sales_forecast(
-                periods=periods,
-                model_type=model_type,
-                params=params
+            forecast = job['result']
+            forecast_model = job['request']['model_type']
+            freq_names = {"D": "days", "W": "weeks", "M": "months"}
+            st.caption(
+                f"{forecast_model.upper()} forecast for {job['request']['periods']} "
+                f"{freq_names[job['request'].get('freq', 'D')]}"
             )
 
             # Create forecast visualization
@@ -654,51 +745,49 @@ elif page == "🔮 Forecast":
 
             # Plot the forecast
             st.subheader("Sales Forecast")
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=forecast_df['Date'],
-                y=forecast_df['Forecast'],
-                name='Forecast',
-                line=dict(color='#007bff')
-            ))
-            fig.add_trace(go.Scatter(
-                x=forecast_df['Date'],
-                y=forecast_df['Upper Bound'],
-                fill=None,
-                mode='lines',
-                line=dict(color='rgba(0,123,255,0.2)'),
-                name='Upper Bound'
-            ))
-            fig.add_trace(go.Scatter(
-                x=forecast_df['Date'],
-                y=forecast_df['Lower Bound'],
-                fill='tonexty',
-                mode='lines',
-                line=dict(color='rgba(0,123,255,0.2)'),
-                name='Lower Bound'
-            ))
-            fig.update_layout(
-                title='Sales Forecast with Confidence Intervals',
-                xaxis_title='Date',
-                yaxis_title='Sales Amount ($)',
-                hovermode='x unified'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            with profile_phase('figure'):
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(
+                    x=forecast_df['Date'],
+                    y=forecast_df['Forecast'],
+                    name='Forecast',
+                    line=dict(color='#007bff')
+                ))
+                fig.add_trace(go.Scatter(
+                    x=forecast_df['Date'],
+                    y=forecast_df['Upper Bound'],
+                    fill=None,
+                    mode='lines',
+                    line=dict(color='rgba(0,123,255,0.2)'),
+                    name='Upper Bound'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=forecast_df['Date'],
+                    y=forecast_df['Lower Bound'],
+                    fill='tonexty',
+                    mode='lines',
+                    line=dict(color='rgba(0,123,255,0.2)'),
+                    name='Lower Bound'
+                ))
+                fig.update_layout(
+                    title='Sales Forecast with Confidence Intervals',
+                    xaxis_title='Date',
+                    yaxis_title='Sales Amount ($)',
+                    hovermode='x unified'
+                )
+            with profile_phase('serialize'):
+                st.plotly_chart(fig, use_container_width=True)
 
             # Display metrics
             st.subheader("Forecast Metrics")
             metrics = forecast['metrics']
             if isinstance(metrics, dict):
-                if model_type == 'ensemble':
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write("Prophet Model Metrics")
-                        for k, v in metrics['prophet'].items():
-                            st.metric(k.upper(), f"{v:.2f}")
-                    with col2:
-                        st.write("ARIMA Model Metrics")
-                        for k, v in metrics['arima'].items():
-                            st.metric(k.upper(), f"{v:.2f}")
+                if forecast_model == 'ensemble':
+                    for col, (member, member_metrics) in zip(st.columns(len(metrics)), metrics.items()):
+                        with col:
+                            st.write(f"{member.upper()} Model Metrics")
+                            for k, v in member_metrics.items():
+                                st.metric(k.upper(), f"{v:.2f}")
                 else:
                     for k, v in metrics.items():
                         st.metric(k.upper(), f"{v:.2f}")
@@ -706,9 +795,9 @@ elif page == "🔮 Forecast":
             # Summary statistics
             st.subheader("Forecast Summary")
             st.metric(
-                "Average Forecasted Daily Sales",
+                "Average Forecasted Sales per Period",
                 f"${np.mean(forecast['predictions']):,.2f}",
-                help="Average daily sales predicted for the forecast period"
+                help="Average sales per day, week or month predicted for the forecast period"
             )
             st.metric(
                 "Total Forecasted Sales",
@@ -723,22 +812,92 @@ elif page == "🔮 Forecast":
 elif page == "🎯 What-If":
     st.header("What-If Analysis")
 
-    scenario = st.selectbox(
-        "Select Scenario",
-        ["price_increase", "marketing_boost"]
+    preset_name = st.selectbox(
+        "Start From",
+        ["custom"] + list(SCENARIO_PRESETS)
     )
+    preset = SCENARIO_PRESETS.get(preset_name, Scenario())
 
-    impact = st.session_state.data_analytics.what_if_analysis(scenario)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        price_change = st.slider("Price Change (%)", -30, 30, int(preset.price_change * 100))
+    with col2:
+        elasticity = st.slider("Price Elasticity", -3.0, 0.0, preset.price_elasticity, 0.1)
+    with col3:
+        uplift = st.slider("Marketing Uplift (%)", 0, 50, int(preset.marketing_uplift * 100))
+
+    cube = data_analytics.get_scenario_cube()
+    with st.expander("Region and Channel Adjustments (%)"):
+        region_adjustments = {
+            region: st.number_input(region, -50, 100, 0, key=f"region_{region}") / 100
+            for region in sorted(cube['sales_region'].dropna().unique())
+        }
+        channel_adjustments = {
+            channel: st.number_input(channel, -50, 100, 0, key=f"channel_{channel}") / 100
+            for channel in sorted(cube['sales_channel'].dropna().unique())
+        }
+    with st.expander("Uncertainty"):
+        elasticity_sd = st.slider("Elasticity Std. Dev.", 0.0, 1.0, preset.elasticity_sd, 0.05)
+        uplift_sd = st.slider("Uplift Std. Dev. (%)", 0.0, 10.0, preset.uplift_sd * 100, 0.5) / 100
+        draws = st.select_slider("Monte Carlo Draws", sorted({1000, 2000, 5000, 10000, 20000, preset.draws}), preset.draws)
+
+    scenario = Scenario(
+        price_change=price_change / 100,
+        price_elasticity=elasticity,
+        marketing_uplift=uplift / 100,
+        region_adjustments=region_adjustments,
+        channel_adjustments=channel_adjustments,
+        elasticity_sd=elasticity_sd,
+        uplift_sd=uplift_sd,
+        draws=draws
+    )
+    impact = data_analytics.what_if_analysis(scenario)
 
     st.subheader("Scenario Impact Analysis")
-    for metric, value in impact.items():
-        st.metric(metric.replace('_', ' ').title(), value)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Expected Revenue", f"${impact['expected_revenue']:,.0f}",
+                f"{impact['revenue_change_pct']:+.1f}%")
+    col2.metric("Revenue 90% Interval",
+                f"${impact['revenue_p5'] / 1e6:,.2f}M - ${impact['revenue_p95'] / 1e6:,.2f}M")
+    col3.metric("P(Revenue Increase)", f"{impact['prob_revenue_increase']:.0%}")
+    col4.metric("Expected Units", f"{impact['expected_units']:,.0f}",
+                f"{impact['units_change_pct']:+.1f}%")
+
+    with profile_phase('figure'):
+        fig = px.histogram(x=impact['revenue_draws'], nbins=60,
+                           title='Simulated Revenue Distribution',
+                           labels={'x': 'Revenue'})
+        fig.add_vline(x=impact['baseline_revenue'], line_dash='dash', annotation_text='Baseline')
+    with profile_phase('serialize'):
+        st.plotly_chart(fig)
+
+    # Price x uplift grid around the chosen elasticity and uncertainty
+    price_grid = np.linspace(-0.3, 0.3, 50)
+    uplift_grid = np.linspace(0.0, 0.5, 10)
+    revenue_change, _ = data_analytics.what_if_grid(scenario, price_grid, uplift_grid)
+    with profile_phase('figure'):
+        fig = px.imshow(
+            revenue_change.T,
+            x=np.round(price_grid * 100, 1),
+            y=np.round(uplift_grid * 100, 1),
+            origin='lower',
+            aspect='auto',
+            color_continuous_scale='RdYlGn',
+            color_continuous_midpoint=0,
+            labels={'x': 'Price Change (%)', 'y': 'Marketing Uplift (%)', 'color': 'Revenue Change (%)'},
+            title='Expected Revenue Change by Price and Uplift'
+        )
+    with profile_phase('serialize'):
+        st.plotly_chart(fig)
 
 elif page == "📥 Data":
+    # pyarrow is loaded only when a page that reads or writes columnar files renders
+    from columnar import FORMATS as COLUMNAR_FORMATS, export_table as export_columnar_table
+
     st.header("Data Import/Export")
 
     # File Upload
-    uploaded_file = st.file_uploader("Upload CSV File", type="csv")
+    uploaded_file = st.file_uploader("Upload Data File", type=["csv", "parquet", "arrow"])
     if uploaded_file is not None:
         table_name = st.selectbox(
             "Select Table to Import To",
@@ -746,8 +905,25 @@ elif page == "📥 Data":
         )
 
         if st.button("Import Data"):
-            st.session_state.data_analytics.import_csv_data(uploaded_file, table_name)
-            st.success(f"Data imported successfully to {table_name} table!")
+            import_status = st.empty()
+
+            def report_progress(rows, rows_per_sec):
+                import_status.text(f"Imported {rows:,} rows ({rows_per_sec:,.0f} rows/sec)...")
+
+            file_format = os.path.splitext(uploaded_file.name)[1].lstrip('.').lower()
+            if file_format in COLUMNAR_FORMATS:
+                result = data_analytics.import_columnar_data(
+                    uploaded_file, table_name, fmt=file_format, progress=report_progress
+                )
+            else:
+                result = data_analytics.import_csv_data(
+                    uploaded_file, table_name, progress=report_progress
+                )
+            import_status.empty()
+            st.success(
+                f"Imported {result.rows:,} rows to {table_name} table "
+                f"in {result.seconds:.1f}s ({result.rows_per_sec:,.0f} rows/sec)!"
+            )
 
     # Data Export
     st.subheader("Export Data")
@@ -756,12 +932,148 @@ elif page == "📥 Data":
         ["motorcycles", "customers", "sales", "market_data"]
     )
 
-    if st.button("Export to CSV"):
-        table_data = pd.read_sql(f'SELECT * FROM {export_table}', db.bind)
-        csv = export_to_csv(table_data, f"{export_table}.csv")
-        st.download_button(
-            label="Download CSV",
-            data=csv,
-            file_name=f"{export_table}.csv",
-            mime="text/csv"
+    export_format = st.radio("Format", ["CSV", "Parquet", "Arrow IPC"], horizontal=True)
+
+    # Streamlit serves downloads from server memory, so CSV is always gzipped
+    # and no file over EXPORT_MAX_BYTES is read back for the browser
+    too_large = (
+        f"{export_table} is larger than the {EXPORT_MAX_BYTES / 1024 ** 2:.0f} MB download limit. "
+        f"Export it on the server instead: `python columnar.py export {export_table} <path>` "
+        f"writes Parquet (add `--format arrow` for Arrow IPC); there is no server-side CSV export."
+    )
+    if export_format == "CSV":
+        if st.button("Export to CSV"):
+            try:
+                with st.spinner(f"Exporting {export_table}..."):
+                    export_file = stream_table_csv(db.bind, export_table, compress=True, max_bytes=EXPORT_MAX_BYTES)
+            except ExportTooLarge:
+                st.error(too_large)
+            else:
+                with export_file, profile_phase('serialize'):
+                    st.download_button(
+                        label="Download CSV (gzip)",
+                        data=export_file.read(),
+                        file_name=f"{export_table}.csv.gz",
+                        mime="application/gzip"
+                    )
+    else:
+        file_format = 'parquet' if export_format == "Parquet" else 'arrow'
+        if st.button(f"Export to {export_format}"):
+            export_data = None
+            with st.spinner(f"Exporting {export_table}..."):
+                with tempfile.TemporaryDirectory() as export_dir:
+                    path = os.path.join(export_dir, f"{export_table}{COLUMNAR_FORMATS[file_format]}")
+                    export_columnar_table(db.bind, export_table, path, fmt=file_format)
+                    if os.path.getsize(path) <= EXPORT_MAX_BYTES:
+                        with open(path, 'rb') as f:
+                            export_data = f.read()
+            if export_data is None:
+                st.error(too_large)
+            else:
+                with profile_phase('serialize'):
+                    st.download_button(
+                        label=f"Download {export_format}",
+                        data=export_data,
+                        file_name=os.path.basename(path),
+                        mime="application/vnd.apache.parquet" if file_format == 'parquet' else "application/vnd.apache.arrow.file"
+                    )
+
+elif page == "🛠️ Admin":
+    st.header("System Administration")
+
+    # Connection Pool
+    st.subheader("Database Connection Pool")
+    status = pool_status()
+    st.caption(f"Pool class: {status['pool_class']}")
+    if 'checked_out' in status:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Pool Size", status['size'])
+        col2.metric("Checked Out", status['checked_out'])
+        col3.metric("Checked In", status['checked_in'])
+        col4.metric("Overflow", status['overflow'])
+    if 'checkouts' in status:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Checkouts", f"{status['checkouts']:,}")
+        col2.metric("Avg. Wait", f"{status['avg_wait_ms']:.1f} ms")
+        col3.metric("Max Wait", f"{status['max_wait_ms']:.1f} ms")
+        col4.metric("Checkout Timeouts", status['checkout_timeouts'])
+
+    # Query telemetry collected by instrumentation.py since the process started
+    st.subheader("Query Performance")
+    query_summary = pd.DataFrame(query_stats.summary())
+    if query_summary.empty:
+        st.info("No queries recorded yet.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Statements", f"{len(query_summary):,}")
+        col2.metric("Executions", f"{query_summary['calls'].sum():,}")
+        col3.metric(f"Slow (≥ {SLOW_QUERY_MS:g} ms)", f"{query_summary['slow'].sum():,}")
+        st.dataframe(
+            query_summary.round({'total_ms': 1, 'mean_ms': 2, 'p50_ms': 2, 'p95_ms': 2, 'max_ms': 2}),
+            use_container_width=True, hide_index=True
+        )
+        histogram = query_stats.histogram()
+        fig_latency = px.bar(
+            x=list(histogram), y=list(histogram.values()),
+            labels={'x': 'Latency', 'y': 'Executions'},
+            title='Query Latency Distribution'
+        )
+        st.plotly_chart(fig_latency, use_container_width=True)
+        slow_queries = query_stats.recent_slow()
+        if slow_queries:
+            st.caption("Most recent slow queries")
+            st.dataframe(pd.DataFrame(slow_queries), use_container_width=True, hide_index=True)
+    if st.button("Reset Query Statistics"):
+        query_stats.reset()
+        st.rerun()
+
+    # Per-page phase timings from profiled runs (see profiling.py)
+    st.subheader("Page Render Timings")
+    timings = pd.DataFrame(page_timings.summary())
+    if timings.empty:
+        st.info("No profiled renders yet. Set PROFILE_PAGES=1 or open a page with ?profile=1.")
+    else:
+        st.dataframe(
+            timings.pivot(index='page', columns='phase', values=['p50_ms', 'p95_ms']).round(1),
+            use_container_width=True
         )
+    if st.button("Reset Render Timings"):
+        page_timings.reset()
+        st.rerun()
+
+    # Daily Arrow snapshots read by the analytics loaders when USE_SNAPSHOTS=1
+    st.subheader("Analytics Snapshot")
+    from columnar import write_snapshot, latest_snapshot  # pyarrow is loaded only on this page
+
+    snapshot = latest_snapshot()
+    st.caption(f"Latest snapshot: {snapshot or 'none'}")
+    if st.button("Write Snapshot"):
+        with st.spinner("Writing snapshot..."):
+            snapshot = write_snapshot(db.bind)
+        st.success(f"Wrote {snapshot}")
+
+    # Churn risk scores for campaign exports
+    st.subheader("Churn Risk Scores")
+    st.caption("Writes a 0-100 churn risk score to every customer record in batches.")
+    if st.button("Rescore Customers"):
+        with st.spinner("Scoring customers..."):
+            scored = crm_analytics.score_churn_risk()
+        st.success(f"Scored {scored:,} customers")
+
+# Return this run's connection to the pool
+db.close()
+
+if render_profile is not None:
+    seconds, total, dump = finish_render(render_profile, page.split(' ', 1)[-1])
+    with st.sidebar.expander("Render Profile", expanded=True):
+        st.caption(f"{total * 1000:,.0f} ms total")
+        st.dataframe(
+            pd.DataFrame({'Phase': list(seconds), 'ms': [value * 1000 for value in seconds.values()]}).round(1),
+            hide_index=True
+        )
+        if dump:
+            st.caption(f"Profile written to {dump}")
+
+# The page has been sent, so load forecasting and clustering backends before they're needed
+if ANALYTICS_PREWARM:
+    prewarm_backends()
@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+import ipaddress
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # cost of new hashes; existing hashes keep their own
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", "2"))  # concurrent bcrypt operations per process
+AUTH_TIMEOUT = float(os.getenv("AUTH_TIMEOUT", "30"))  # seconds a login waits for a hashing worker
+LOGIN_WINDOW = float(os.getenv("LOGIN_WINDOW", "300"))  # seconds failed attempts are counted for
+LOGIN_MAX_FAILURES_PER_USER = int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", "5"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+# Reverse proxies (addresses or CIDRs) whose X-Forwarded-For header is believed
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(item.strip(), strict=False)
+    for item in os.getenv("TRUSTED_PROXIES", "").split(',') if item.strip()
+]
+
+# bcrypt releases the GIL, so a small thread pool bounds CPU use without
+# blocking other sessions' script threads while a hash is computed
+_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix='bcrypt')
+
+
+class AuthBusy(Exception):
+    """The hashing pool could not start the operation within AUTH_TIMEOUT"""
+
+
+def _run_bcrypt(func, *args):
+    """Run a bcrypt call on the hashing pool, giving up if it waits longer than AUTH_TIMEOUT"""
+    future = _executor.submit(func, *args)
+    try:
+        return future.result(timeout=AUTH_TIMEOUT)
+    except FutureTimeoutError:
+        # Drops the call if it is still queued; one already hashing runs to completion
+        future.cancel()
+        logger.warning(f"bcrypt pool busy: gave up after {AUTH_TIMEOUT:.0f}s")
+        raise AuthBusy("The server is busy; please try again in a few seconds") from None
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    """bcrypt hash of `password`, computed on the hashing pool; raises AuthBusy when it is saturated"""
+    return _run_bcrypt(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def check_password(password, hashed_password):
+    """Verify `password` against a bcrypt hash on the hashing pool; raises AuthBusy when it is saturated"""
+    return _run_bcrypt(bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def _is_trusted_proxy(address, trusted):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_ip(peer, forwarded_for='', trusted=None):
+    """Address to rate-limit a login by.
+
+    X-Forwarded-For is only honoured when the connection comes from one of
+    the TRUSTED_PROXIES; the client is then the right-most forwarded
+    address that is not itself a trusted proxy. Anyone else can put
+    arbitrary addresses in that header.
+    """
+    trusted = TRUSTED_PROXIES if trusted is None else trusted
+    if not peer or not _is_trusted_proxy(peer, trusted):
+        return peer or None
+    for address in reversed([item.strip() for item in (forwarded_for or '').split(',') if item.strip()]):
+        if not _is_trusted_proxy(address, trusted):
+            return address
+    return peer
+
+
+class LoginRateLimiter:
+    """Sliding-window limit on failed logins per username and per client address"""
+
+    def __init__(self, window=LOGIN_WINDOW, max_per_user=LOGIN_MAX_FAILURES_PER_USER,
+                 max_per_ip=LOGIN_MAX_FAILURES_PER_IP):
+        self.window = window
+        self.limits = {'user': max_per_user, 'ip': max_per_ip}
+        self._failures = {}  # (kind, value) -> deque of failure times
+        self._lock = threading.Lock()
+
+    def _keys(self, username, ip):
+        keys = [('user', (username or '').lower())]
+        if ip:
+            keys.append(('ip', ip))
+        return keys
+
+    def retry_after(self, username, ip=None):
+        """Seconds until another attempt is allowed; 0 if it is allowed now"""
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for key in self._keys(username, ip):
+                failures = self._failures.get(key)
+                if not failures:
+                    continue
+                while failures and failures[0] <= now - self.window:
+                    failures.popleft()
+                if len(failures) >= self.limits[key[0]]:
+                    wait = max(wait, failures[0] + self.window - now)
+        return wait
+
+    def record_failure(self, username, ip=None):
+        now = time.monotonic()
+        with self._lock:
+            for key in self._keys(username, ip):
+                self._failures.setdefault(key, deque()).append(now)
+            if len(self._failures) > 10_000:
+                # Many distinct usernames: drop keys with no failure left in the window
+                stale = [key for key, failures in self._failures.items() if not failures or failures[-1] <= now - self.window]
+                for key in stale:
+                    del self._failures[key]
+
+    def reset(self, username):
+        """Forget a user's failures after a successful login; address counts are kept"""
+        with self._lock:
+            self._failures.pop(('user', (username or '').lower()), None)
+
+
+# Process-wide instance shared by all Streamlit sessions
+login_rate_limiter = LoginRateLimiter()
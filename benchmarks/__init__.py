@@ -0,0 +1 @@
+"""Benchmarks for the data and analytics hot paths; run with `python -m benchmarks --help`"""
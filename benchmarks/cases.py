@@ -0,0 +1,192 @@
+"""Benchmark cases.
+
+Each case receives a BenchmarkContext for one seeded database and returns
+the zero-argument callable to time, or a (setup, callable) pair when every
+round needs untimed preparation. The runner clears the result cache and the
+fitted-model store before each round, so cases measure the uncached path.
+"""
+import os
+import shutil
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Optional
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import MotorcycleDSS
+from analytics import DataAnalytics, CRMAnalytics
+from scenarios import Scenario
+from segmentation import segmentation_service
+from utils import create_sales_trend_chart, create_inventory_pie_chart, stream_table_csv
+
+FORECAST_MODELS = ['prophet', 'arima', 'ets', 'seasonal_naive']
+FORECAST_PERIODS = 30
+
+
+@dataclass
+class Benchmark:
+    name: str
+    make: Callable
+    rounds: Optional[int] = None  # upper bound on rounds for slow cases
+
+
+BENCHMARKS = []
+
+
+def benchmark(name, rounds=None):
+    """Register a case under a dotted `group.case` name"""
+    def decorator(make):
+        BENCHMARKS.append(Benchmark(name, make, rounds))
+        return make
+    return decorator
+
+
+class BenchmarkContext:
+    """One seeded database plus a scratch directory for a benchmark scale"""
+
+    def __init__(self, scale, bind, workdir):
+        self.scale = scale
+        self.bind = bind
+        self.workdir = workdir
+        self._sessions = sessionmaker(bind=bind)
+        self.session = self._sessions()
+
+    def close(self):
+        self.session.close()
+
+
+# --- Metric and data loaders ---
+
+for _method in ['get_kpi_snapshot', 'get_inventory_metrics', 'get_sales_metrics', 'get_customer_metrics',
+                'get_sales_data', 'get_inventory_data', 'get_customer_data']:
+    benchmark(f"loaders.{_method}")(
+        lambda ctx, method=_method: getattr(MotorcycleDSS(ctx.session), method)
+    )
+
+
+# --- Analytics ---
+
+@benchmark("analytics.statistical_analysis")
+def statistical_analysis(ctx):
+    return partial(DataAnalytics(ctx.session).statistical_analysis, 'sales')
+
+
+@benchmark("analytics.sales_series")
+def sales_series(ctx):
+    return partial(DataAnalytics(ctx.session).get_sales_series, 'D')
+
+
+@benchmark("analytics.customer_segmentation")
+def customer_segmentation(ctx):
+    """Steady state: the model is fitted and every customer already has a segment"""
+    segmentation_service.reset()
+    return DataAnalytics(ctx.session).customer_segmentation
+
+
+@benchmark("analytics.customer_segmentation_refit", rounds=3)
+def customer_segmentation_refit(ctx):
+    """Fit from scratch and relabel every customer"""
+    return segmentation_service.reset, DataAnalytics(ctx.session).customer_segmentation
+
+
+@benchmark("analytics.customer_lifetime_value")
+def customer_lifetime_value(ctx):
+    return CRMAnalytics(ctx.session).customer_lifetime_value
+
+
+@benchmark("analytics.churn_risk_analysis")
+def churn_risk_analysis(ctx):
+    return CRMAnalytics(ctx.session).churn_risk_analysis
+
+
+@benchmark("analytics.score_churn_risk", rounds=3)
+def score_churn_risk(ctx):
+    return CRMAnalytics(ctx.session).score_churn_risk
+
+
+# --- Forecasting, one case per model; every round refits ---
+
+def _sales_forecast(ctx, model_type):
+    return partial(DataAnalytics(ctx.session).sales_forecast, periods=FORECAST_PERIODS, model_type=model_type)
+
+
+for _model in FORECAST_MODELS:
+    benchmark(f"forecast.{_model}", rounds=3)(partial(_sales_forecast, model_type=_model))
+
+
+# --- What-if scenarios ---
+
+@benchmark("scenarios.what_if_analysis")
+def what_if_analysis(ctx):
+    return partial(DataAnalytics(ctx.session).what_if_analysis, Scenario(price_change=0.05, marketing_uplift=0.1))
+
+
+@benchmark("scenarios.what_if_grid")
+def what_if_grid(ctx):
+    return partial(
+        DataAnalytics(ctx.session).what_if_grid,
+        Scenario(), np.linspace(-0.3, 0.3, 50), np.linspace(0.0, 0.5, 10)
+    )
+
+
+# --- CSV import / export ---
+
+def _export_sales(ctx, compress):
+    def run():
+        with stream_table_csv(ctx.bind, 'sales', compress=compress) as export_file:
+            export_file.seek(0, os.SEEK_END)
+            return export_file.tell()
+    return run
+
+
+benchmark("io.export_sales_csv")(partial(_export_sales, compress=False))
+benchmark("io.export_sales_csv_gzip")(partial(_export_sales, compress=True))
+
+
+@benchmark("io.import_sales_csv", rounds=3)
+def import_sales_csv(ctx):
+    """Import the scale's sales table into an empty database"""
+    source = os.path.join(ctx.workdir, 'sales.csv')
+    with stream_table_csv(ctx.bind, 'sales') as export_file, open(source, 'wb') as f:
+        shutil.copyfileobj(export_file, f)
+    target = os.path.join(ctx.workdir, 'import.db')
+    state = {}
+
+    def setup():
+        if 'engine' in state:
+            state['session'].close()
+            state['engine'].dispose()
+        if os.path.exists(target):
+            os.remove(target)
+        state['engine'] = create_engine(f"sqlite:///{target}")
+        Base.metadata.create_all(bind=state['engine'])
+        state['session'] = sessionmaker(bind=state['engine'])()
+
+    def run():
+        return DataAnalytics(state['session']).import_csv_data(source, 'sales')
+
+    return setup, run
+
+
+# --- Chart building ---
+
+@benchmark("charts.sales_trend")
+def sales_trend_chart(ctx):
+    sales = MotorcycleDSS(ctx.session).get_sales_data()
+    return partial(create_sales_trend_chart, sales)
+
+
+@benchmark("charts.sales_trend_json")
+def sales_trend_chart_json(ctx):
+    """Build and serialize, as st.plotly_chart does"""
+    sales = MotorcycleDSS(ctx.session).get_sales_data()
+    return lambda: create_sales_trend_chart(sales).to_json()
+
+
+@benchmark("charts.inventory_pie")
+def inventory_pie_chart(ctx):
+    inventory = MotorcycleDSS(ctx.session).get_inventory_data()
+    return partial(create_inventory_pie_chart, inventory)
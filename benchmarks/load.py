@@ -0,0 +1,377 @@
+"""Load test: concurrent authenticated dashboard sessions driven headlessly.
+
+    python -m benchmarks.load --sessions 8 --duration 60
+    python -m benchmarks.load --sessions 16 --scale medium --forecast-models arima,ets
+    python -m benchmarks.load --database-url postgresql://... --sessions 32
+
+Every simulated user is a Streamlit AppTest session running app.py in this
+process, the way one Streamlit server runs every browser session. Each one
+logs in through the login form, then cycles through Dashboard, Sales,
+Customers and Forecast until the duration is up. On Forecast it submits a
+forecast and waits for the job like a user watching the progress message.
+
+The report covers page views per second, render latency percentiles per
+page, forecast job latency and how the sessions used the connection pool:
+peak and average connections checked out, how long each checkout was held,
+and how much of that time was spent executing statements.
+"""
+import os
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.runner import SCALES, seed_database, database_path
+
+logger = logging.getLogger(__name__)
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+LOAD_PAGES = ["📊 Dashboard", "💰 Sales", "👥 Customers", "🔮 Forecast"]
+LOAD_PASSWORD = 'load-test-password'
+DEFAULT_FORECAST_MODELS = ['prophet', 'arima', 'ets']
+FORECAST_POLL_INTERVAL = 2.0  # seconds, matching the app's progress fragment
+
+
+class PoolMonitor:
+    """Connection checkouts on an engine's pool, from pool checkout/checkin events"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.pool = engine.pool
+        self.checked_out = 0
+        self.peak = 0
+        self.checkouts = 0
+        self.hold_times = []
+        self._area = 0.0  # integral of checked_out over time
+        self._started = self._last = time.perf_counter()
+        self._lock = threading.Lock()
+        event.listen(self.pool, 'checkout', self._checkout)
+        event.listen(self.pool, 'checkin', self._checkin)
+
+    def _advance(self, now):
+        self._area += self.checked_out * (now - self._last)
+        self._last = now
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        now = time.perf_counter()
+        connection_record.info['load_checked_out_at'] = now
+        with self._lock:
+            self._advance(now)
+            self.checked_out += 1
+            self.checkouts += 1
+            self.peak = max(self.peak, self.checked_out)
+
+    def _checkin(self, dbapi_connection, connection_record):
+        now = time.perf_counter()
+        started = connection_record.info.pop('load_checked_out_at', None)
+        with self._lock:
+            if started is None:
+                return  # checked out before the monitor started
+            self._advance(now)
+            self.checked_out -= 1
+            self.hold_times.append(now - started)
+
+    def report(self):
+        from database import pool_status
+
+        with self._lock:
+            self._advance(time.perf_counter())
+            elapsed = self._last - self._started
+            holds = np.array(self.hold_times) * 1000
+            report = {
+                'checkouts': self.checkouts,
+                'peak_checked_out': self.peak,
+                'mean_checked_out': self._area / elapsed if elapsed else 0.0,
+                'held_seconds': float(holds.sum() / 1000),
+                'hold_p50_ms': float(np.percentile(holds, 50)) if len(holds) else 0.0,
+                'hold_p95_ms': float(np.percentile(holds, 95)) if len(holds) else 0.0,
+                'hold_max_ms': float(holds.max()) if len(holds) else 0.0
+            }
+        status = pool_status()
+        if 'size' in status:
+            report['capacity'] = status['size'] + getattr(self.pool, '_max_overflow', 0)
+        for key in ('avg_wait_ms', 'max_wait_ms', 'checkout_timeouts'):
+            if key in status:
+                report[key] = status[key]
+        return report
+
+
+class LoadStats:
+    """Latencies and errors collected from every simulated session"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)  # page -> seconds
+        self.forecasts = []  # {'model', 'queued_s', 'observed_s', 'status'}
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def record(self, page, seconds, errors=()):
+        with self._lock:
+            self.latencies[page].append(seconds)
+            self.errors.extend(f"{page}: {message}" for message in errors)
+
+    def record_forecast(self, **forecast):
+        with self._lock:
+            self.forecasts.append(forecast)
+
+
+def _labelled(elements, label):
+    return next(element for element in elements if element.label == label)
+
+
+def _render_errors(at):
+    return [str(e.value)[:300] for e in at.exception] + [str(e.value)[:300] for e in at.error]
+
+
+class SimulatedSession:
+    """One user: log in, then cycle through the dashboard pages until the deadline"""
+
+    def __init__(self, index, stats, deadline, forecast_models, think_time, timeout, seed):
+        self.index = index
+        self.stats = stats
+        self.deadline = deadline
+        self.forecast_models = forecast_models
+        self.think_time = think_time
+        self.timeout = timeout
+        self.rng = random.Random(seed + index)
+        self.at = None
+
+    def _timed_run(self, page, action):
+        started = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - started
+        self.stats.record(page, elapsed, _render_errors(self.at))
+        return elapsed
+
+    def login(self):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+        self.at.session_state['db_initialized'] = True  # the harness seeded the database
+        self.at.run()
+        self.at.text_input[0].input(f"load-{self.index}")
+        self.at.text_input[1].input(LOAD_PASSWORD)
+        self._timed_run('Login', _labelled(self.at.button, "Login").click().run)
+        if not self.at.session_state['authenticated']:
+            raise RuntimeError(f"Session {self.index} could not log in")
+
+    def run(self):
+        try:
+            self.login()
+            # Sessions start on different pages so they don't move in lockstep
+            step = self.index
+            while time.monotonic() < self.deadline:
+                page = LOAD_PAGES[step % len(LOAD_PAGES)]
+                step += 1
+                self._timed_run(page.split(' ', 1)[1], self.at.sidebar.selectbox[0].select(page).run)
+                if page == "🔮 Forecast" and self.forecast_models:
+                    self.forecast()
+                if self.think_time:
+                    time.sleep(self.rng.uniform(0.5, 1.5) * self.think_time)
+        except Exception as e:
+            logger.exception(f"Session {self.index} stopped")
+            self.stats.record('Session', 0.0, [str(e)])
+
+    def forecast(self):
+        """Submit a forecast and poll until its result is rendered"""
+        from jobs import get_job_runner
+
+        model = self.rng.choice(self.forecast_models)
+        _labelled(self.at.selectbox, "Select Forecasting Model").select(model)
+        # Distinct horizons keep sessions from sharing one deduplicated job
+        _labelled(self.at.slider, "Forecast Periods").set_value(self.rng.randint(7, 90))
+        self.at.run()
+        started = time.perf_counter()
+        self._timed_run('Forecast submit', _labelled(self.at.button, "Generate Forecast").click().run)
+        job_id = self.at.session_state['forecast_job']
+        job = get_job_runner().get(job_id)
+        while job is not None and job['status'] == 'running' and time.perf_counter() - started < self.timeout:
+            time.sleep(FORECAST_POLL_INTERVAL)
+            job = get_job_runner().get(job_id)
+        self._timed_run('Forecast result', self.at.run)
+        status = job['status'] if job else 'missing'
+        self.stats.record_forecast(
+            model=model,
+            status=status,
+            job_s=job['finished_at'] - job['submitted_at'] if job and 'finished_at' in job else None,
+            observed_s=time.perf_counter() - started
+        )
+
+
+def _percentiles(values):
+    values = np.array(values) * 1000
+    return {
+        'count': len(values),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max())
+    }
+
+
+def build_report(stats, pool, elapsed, sessions):
+    from instrumentation import query_stats
+
+    page_views = sum(len(values) for page, values in stats.latencies.items() if page not in ('Login', 'Session'))
+    statements = query_stats.summary()
+    statement_seconds = sum(row['total_ms'] for row in statements) / 1000
+    render_seconds = sum(sum(values) for values in stats.latencies.values())
+    pool_report = pool.report()
+    pool_report['statement_seconds'] = statement_seconds
+    # How much of the time a connection sat checked out was spent executing statements
+    pool_report['busy_share'] = statement_seconds / pool_report['held_seconds'] if pool_report['held_seconds'] else 0.0
+    pool_report['held_share_of_render'] = pool_report['held_seconds'] / render_seconds if render_seconds else 0.0
+
+    forecasts = {}
+    for model in sorted({f['model'] for f in stats.forecasts}):
+        done = [f for f in stats.forecasts if f['model'] == model and f['job_s'] is not None]
+        forecasts[model] = {
+            'submitted': sum(f['model'] == model for f in stats.forecasts),
+            'failed': sum(f['model'] == model and f['status'] != 'done' for f in stats.forecasts),
+            'job': _percentiles([f['job_s'] for f in done]) if done else None,
+            'observed': _percentiles([f['observed_s'] for f in stats.forecasts if f['model'] == model])
+        }
+    return {
+        'sessions': sessions,
+        'elapsed_s': elapsed,
+        'page_views': page_views,
+        'throughput_per_s': page_views / elapsed if elapsed else 0.0,
+        'errors': len(stats.errors),
+        'error_samples': stats.errors[:10],
+        'pages': {page: _percentiles(values) for page, values in sorted(stats.latencies.items()) if values},
+        'forecasts': forecasts,
+        'pool': pool_report,
+        'top_statements': [
+            {key: row[key] for key in ('statement', 'calls', 'total_ms', 'p95_ms', 'callers')}
+            for row in statements[:5]
+        ]
+    }
+
+
+def print_report(report):
+    print(f"\n{report['sessions']} sessions for {report['elapsed_s']:.1f}s: {report['page_views']} page views, "
+          f"{report['throughput_per_s']:.2f} views/s, {report['errors']} error(s)")
+    for sample in report['error_samples']:
+        print(f"  ! {sample}")
+
+    print(f"\n{'page':<18} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for page, row in report['pages'].items():
+        print(f"{page:<18} {row['count']:>6} {row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} "
+              f"{row['p99_ms']:>10.1f} {row['max_ms']:>10.1f}")
+
+    if report['forecasts']:
+        print(f"\n{'forecast':<18} {'jobs':>6} {'failed':>6} {'job p50 s':>10} {'job p95 s':>10} {'wait p95 s':>10}")
+        for model, row in report['forecasts'].items():
+            job = row['job'] or {'p50_ms': float('nan'), 'p95_ms': float('nan')}
+            print(f"{model:<18} {row['submitted']:>6} {row['failed']:>6} {job['p50_ms'] / 1000:>10.2f} "
+                  f"{job['p95_ms'] / 1000:>10.2f} {row['observed']['p95_ms'] / 1000:>10.2f}")
+
+    pool = report['pool']
+    capacity = f" of {pool['capacity']}" if 'capacity' in pool else ''
+    print(f"\nConnections: {pool['checkouts']} checkouts, peak {pool['peak_checked_out']}{capacity} checked out, "
+          f"{pool['mean_checked_out']:.2f} on average")
+    print(f"  held p50 {pool['hold_p50_ms']:.1f} ms, p95 {pool['hold_p95_ms']:.1f} ms, max {pool['hold_max_ms']:.1f} ms; "
+          f"held for {pool['held_share_of_render']:.0%} of render time, executing statements "
+          f"{pool['busy_share']:.0%} of the time held")
+    if 'avg_wait_ms' in pool:
+        print(f"  checkout wait avg {pool['avg_wait_ms']:.1f} ms, max {pool['max_wait_ms']:.1f} ms, "
+              f"{pool['checkout_timeouts']} timeout(s)")
+
+    print("\nSlowest statements by total time:")
+    for row in report['top_statements']:
+        print(f"  {row['total_ms']:>10.1f} ms {row['calls']:>6}x  {row['callers'][:60]:<60} {row['statement'][:70]}")
+
+
+def _prepare_database(scale, url, workdir):
+    """Seed the load-test database; SQLite runs on a scratch copy of the scale's file"""
+    if url is None:
+        seed_database(scale).dispose()
+        shutil.copyfile(database_path(scale), os.path.join(workdir, 'load.db'))
+    else:
+        seed_database(scale, url=url).dispose()
+
+
+def _create_users(sessions):
+    """Load-test accounts load-0 .. load-N sharing one password"""
+    from database import session_scope
+    from models import User
+    from auth import hash_password
+
+    hashed = hash_password(LOAD_PASSWORD)
+    with session_scope() as db:
+        User.__table__.create(bind=db.bind, checkfirst=True)
+        existing = {name for (name,) in db.query(User.username).filter(User.username.like('load-%'))}
+        db.add_all([User(username=f"load-{i}", hashed_password=hashed)
+                    for i in range(sessions) if f"load-{i}" not in existing])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions against app.py")
+    parser.add_argument('--sessions', type=int, default=8, help="Concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=60, help="Seconds each session keeps navigating")
+    parser.add_argument('--ramp-up', type=float, default=0, help="Seconds over which sessions start")
+    parser.add_argument('--think-time', type=float, default=0, help="Mean pause between page views, seconds")
+    parser.add_argument('--scale', choices=list(SCALES), default='small', help="Generated dataset size")
+    parser.add_argument('--database-url', help="Run against this database instead of a scratch SQLite copy")
+    parser.add_argument('--forecast-models', default=','.join(DEFAULT_FORECAST_MODELS),
+                        help="Comma-separated models submitted from the Forecast page; empty to skip forecasting")
+    parser.add_argument('--timeout', type=float, default=300, help="Seconds allowed per page render or forecast")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    from streamlit.logger import set_log_level
+    set_log_level('error')  # AppTest sessions warn about bare mode on every run
+    with tempfile.TemporaryDirectory(prefix='loadtest-') as workdir:
+        # The app reads these when its modules are first imported, seeding included
+        os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(workdir, 'load.db')}"
+        os.environ['SEGMENT_MODEL_PATH'] = os.path.join(workdir, 'segmentation.joblib')
+        os.environ['FORECAST_JOB_DIR'] = os.path.join(workdir, 'jobs')
+        os.environ['USE_SNAPSHOTS'] = '0'
+        os.environ['FORECAST_MODEL_DIR'] = os.path.join(workdir, 'models')
+        _prepare_database(args.scale, args.database_url, workdir)
+
+        from database import engine, init_db
+        from jobs import get_job_runner
+
+        init_db()
+        _create_users(args.sessions)
+        pool = PoolMonitor(engine)
+
+        stats = LoadStats()
+        forecast_models = [model.strip() for model in args.forecast_models.split(',') if model.strip()]
+        started = time.monotonic()
+        deadline = started + args.ramp_up + args.duration
+        threads = []
+        for i in range(args.sessions):
+            session = SimulatedSession(i, stats, deadline, forecast_models, args.think_time, args.timeout, args.seed)
+            thread = threading.Thread(target=session.run, name=f"load-{i}", daemon=True)
+            thread.start()
+            threads.append(thread)
+            if args.ramp_up and i < args.sessions - 1:
+                time.sleep(args.ramp_up / (args.sessions - 1))
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = build_report(stats, pool, elapsed, args.sessions)
+        get_job_runner().shutdown()
+        engine.dispose()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Run the benchmark suite against seeded SQLite databases and compare runs.
+
+    python -m benchmarks                          # small and medium scales
+    python -m benchmarks --scales large -k forecast
+    python -m benchmarks --compare latest --fail-on-regression
+
+Each scale is generated once with data_generator.populate_database and a
+fixed seed, then reused from BENCHMARK_DATA_DIR. Every case gets one warm-up
+round followed by timed rounds. Results are written as JSON to
+benchmarks/results/, and --compare reports the median change against an
+earlier results file.
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from fnmatch import fnmatch
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DATA_DIR = os.getenv("BENCHMARK_DATA_DIR", os.path.join(BENCHMARK_DIR, ".data"))
+BENCHMARK_RESULTS_DIR = os.getenv("BENCHMARK_RESULTS_DIR", os.path.join(BENCHMARK_DIR, "results"))
+BENCHMARK_SEED = 42
+
+# Row counts passed to populate_database
+SCALES = {
+    'small': {'n_motorcycles': 100, 'n_customers': 400, 'n_sales': 500},
+    'medium': {'n_motorcycles': 500, 'n_customers': 10_000, 'n_sales': 50_000},
+    'large': {'n_motorcycles': 1_000, 'n_customers': 100_000, 'n_sales': 500_000}
+}
+DEFAULT_SCALES = ['small', 'medium']
+DEFAULT_ROUNDS = 5
+
+REGRESSION_THRESHOLD = 0.2  # a median this much slower than the baseline is a regression
+NOISE_FLOOR = 0.002  # seconds; smaller absolute changes are never reported
+
+
+def _isolate_environment(workdir):
+    """Keep benchmarks away from the app's database, fitted models and snapshots.
+
+    Must run before the application modules are imported, because they read
+    these settings at import time.
+    """
+    os.environ['DATABASE_URL'] = 'sqlite://'  # cases use their own engines
+    os.environ['SEGMENT_MODEL_PATH'] = os.path.join(workdir, 'segmentation.joblib')
+    os.environ['USE_SNAPSHOTS'] = '0'
+    os.environ['ANALYTICS_PREWARM'] = '0'
+    os.environ['QUERY_INSTRUMENTATION'] = '0'
+    os.environ['FORECAST_MODEL_DIR'] = ''  # forecast cases measure the fit
+
+
+def database_path(scale, directory=BENCHMARK_DATA_DIR):
+    """Location of the scale's generated SQLite database"""
+    name = '-'.join([scale] + [str(n) for n in SCALES[scale].values()] + [f"seed{BENCHMARK_SEED}"])
+    return os.path.join(directory, f"{name}.db")
+
+
+def seed_database(scale, directory=BENCHMARK_DATA_DIR, url=None):
+    """Engine for the scale's database, generating its data on first use.
+
+    Defaults to a SQLite file under `directory`; `url` seeds another database
+    instead, which is left alone if it already has data. A database kept
+    from an earlier run gets any columns and indexes added to the models
+    since, as the app does at startup.
+    """
+    from sqlalchemy import create_engine
+    from data_generator import populate_database
+    from database import ensure_columns, ensure_indexes
+
+    if url is None:
+        os.makedirs(directory, exist_ok=True)
+        url = f"sqlite:///{database_path(scale, directory)}"
+    engine = create_engine(url)
+    started = time.perf_counter()
+    populate_database(seed=BENCHMARK_SEED, bind=engine, **SCALES[scale])  # no-op when already populated
+    ensure_columns(engine)
+    ensure_indexes(engine)
+    elapsed = time.perf_counter() - started
+    if elapsed > 1:
+        print(f"Seeded {scale} database in {elapsed:.1f}s: {engine.url.render_as_string(hide_password=True)}")
+    return engine
+
+
+def _reset_caches():
+    from cache import result_cache
+    from model_store import model_store
+    result_cache.clear()
+    model_store.clear()
+
+
+def run_case(case, ctx, rounds):
+    """Time one case; return its result record"""
+    record = {'name': case.name, 'scale': ctx.scale}
+    try:
+        made = case.make(ctx)
+        setup, func = made if isinstance(made, tuple) else (None, made)
+        rounds = min(rounds, case.rounds) if case.rounds else rounds
+        times = []
+        for i in range(rounds + 1):
+            _reset_caches()
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            func()
+            if i:  # the first round is a warm-up
+                times.append(time.perf_counter() - started)
+    except Exception as e:
+        logger.exception(f"Benchmark {case.name} failed on {ctx.scale}")
+        record['error'] = str(e)
+        return record
+    record.update(
+        rounds=len(times),
+        min=min(times),
+        median=statistics.median(times),
+        mean=statistics.fmean(times),
+        stdev=statistics.stdev(times) if len(times) > 1 else 0.0
+    )
+    return record
+
+
+def select_cases(cases, patterns):
+    if not patterns:
+        return list(cases)
+    patterns = [pattern if any(ch in pattern for ch in '*?[') else f"*{pattern}*" for pattern in patterns]
+    return [case for case in cases if any(fnmatch(case.name, pattern) for pattern in patterns)]
+
+
+def _metadata(scales, rounds):
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'rounds': rounds,
+        'seed': BENCHMARK_SEED,
+        'scales': {scale: SCALES[scale] for scale in scales}
+    }
+
+
+def save_results(results, metadata, directory=BENCHMARK_RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, 'w') as f:
+        json.dump({'metadata': metadata, 'results': results}, f, indent=2)
+    return path
+
+
+def load_baseline(path, directory=BENCHMARK_RESULTS_DIR):
+    """Results of an earlier run by path, or the newest saved run for 'latest'"""
+    if path == 'latest':
+        saved = sorted(name for name in os.listdir(directory) if name.endswith('.json')) if os.path.isdir(directory) else []
+        if not saved:
+            return None, None
+        path = os.path.join(directory, saved[-1])
+    with open(path) as f:
+        return path, {(r['name'], r['scale']): r for r in json.load(f)['results'] if 'median' in r}
+
+
+def compare(record, baseline, threshold=REGRESSION_THRESHOLD):
+    """(relative median change, verdict) against the baseline record, or (None, '') without one"""
+    previous = baseline.get((record['name'], record['scale'])) if baseline else None
+    if previous is None or 'median' not in record:
+        return None, ''
+    change = record['median'] / previous['median'] - 1 if previous['median'] else 0.0
+    if abs(record['median'] - previous['median']) < NOISE_FLOOR:
+        return change, ''
+    if change > threshold:
+        return change, 'REGRESSION'
+    if change < -threshold:
+        return change, 'faster'
+    return change, ''
+
+
+def _format_row(record, change, verdict):
+    if 'error' in record:
+        return f"{record['name']:<42} {record['scale']:<7} FAILED: {record['error']}"
+    ms = {key: record[key] * 1000 for key in ('min', 'median', 'mean', 'stdev')}
+    row = (f"{record['name']:<42} {record['scale']:<7} {record['rounds']:>3} "
+           f"{ms['min']:>11.2f} {ms['median']:>11.2f} {ms['mean']:>11.2f} {ms['stdev']:>9.2f}")
+    if change is not None:
+        row += f" {change:>+8.1%} {verdict}"
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data and analytics hot paths")
+    parser.add_argument('--scales', default=','.join(DEFAULT_SCALES),
+                        help=f"Comma-separated scales from {', '.join(SCALES)}")
+    parser.add_argument('-k', dest='patterns', action='append', default=[],
+                        help="Only run cases whose name matches (substring or glob); repeatable")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help="Timed rounds per case")
+    parser.add_argument('--compare', help="Baseline results file, or 'latest' for the newest saved run")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative median slowdown reported as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with status 1 on any regression")
+    parser.add_argument('--no-save', action='store_true', help="Don't write a results file")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit")
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scale(s): {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix='benchmarks-') as workdir:
+        _isolate_environment(workdir)
+        from benchmarks.cases import BENCHMARKS, BenchmarkContext
+
+        cases = select_cases(BENCHMARKS, args.patterns)
+        if args.list:
+            for case in cases:
+                print(case.name)
+            return
+
+        # Read the baseline before this run's results are saved next to it
+        baseline_path, baseline = load_baseline(args.compare) if args.compare else (None, None)
+        if args.compare and baseline is None:
+            print(f"No saved results to compare with in {BENCHMARK_RESULTS_DIR}")
+        elif baseline_path:
+            print(f"Comparing with {baseline_path}")
+
+        print(f"{'case':<42} {'scale':<7} {'n':>3} {'min ms':>11} {'median ms':>11} {'mean ms':>11} {'stdev':>9}")
+        results, regressions = [], 0
+        for scale in scales:
+            engine = seed_database(scale)
+            scale_dir = os.path.join(workdir, scale)
+            os.makedirs(scale_dir)
+            ctx = BenchmarkContext(scale, engine, scale_dir)
+            try:
+                for case in cases:
+                    record = run_case(case, ctx, args.rounds)
+                    change, verdict = compare(record, baseline, args.threshold)
+                    regressions += verdict == 'REGRESSION'
+                    results.append(record)
+                    print(_format_row(record, change, verdict), flush=True)
+            finally:
+                ctx.close()
+                engine.dispose()
+
+    if not args.no_save:
+        print(f"Saved results to {save_results(results, _metadata(scales, args.rounds))}")
+    if baseline:
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    if regressions and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
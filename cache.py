@@ -0,0 +1,129 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))  # seconds
+RESULT_CACHE_MAXSIZE = int(os.getenv("RESULT_CACHE_MAXSIZE", "128"))
+
+
+class ResultCache:
+    """Thread-safe TTL + LRU cache for query results, invalidated per table.
+
+    Cached values are shared by every caller in the process, so they must be
+    treated as read-only.
+    """
+
+    def __init__(self, ttl=RESULT_CACHE_TTL, maxsize=RESULT_CACHE_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires_at, tables, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            expires_at, _, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, True
+
+    def set(self, key, value, tables=(), ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, frozenset(tables), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tables):
+        """Drop every entry that depends on any of the given tables"""
+        tables = set(tables)
+        with self._lock:
+            stale = [key for key, (_, deps, _) in self._entries.items() if deps & tables]
+            for key in stale:
+                del self._entries[key]
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached result(s) for {', '.join(sorted(tables))}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Process-wide instance shared by every Streamlit session
+result_cache = ResultCache()
+
+
+def cached(*tables, ttl=None):
+    """Cache a method's result in result_cache, keyed by method and arguments.
+
+    The instance (and the session it holds) is not part of the key, so all
+    sessions share one entry. `tables` lists the tables the result is derived
+    from; writes to any of them evict the entry.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                # Unhashable arguments (e.g. dict params) bypass the cache
+                return func(self, *args, **kwargs)
+            value, hit = result_cache.get(key)
+            if hit:
+                return value
+            value = func(self, *args, **kwargs)
+            result_cache.set(key, value, tables=tables, ttl=ttl)
+            return value
+
+        return wrapper
+    return decorator
+
+
+@event.listens_for(Session, "after_flush")
+def _track_written_tables(session, flush_context):
+    tables = session.info.setdefault('written_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            tables.add(table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_tables(session):
+    tables = session.info.pop('written_tables', None)
+    if tables:
+        result_cache.invalidate(*tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_tables(session):
+    session.info.pop('written_tables', None)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from sqlalchemy import select, Integer, Float, Date, String, Text, JSON
+
+from importer import IMPORT_TABLES, ImportResult
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_CHUNKSIZE = int(os.getenv("COLUMNAR_CHUNKSIZE", "50000"))  # rows per record batch
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_MAX_AGE_DAYS = int(os.getenv("SNAPSHOT_MAX_AGE_DAYS", "1"))
+
+FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow'  # Arrow IPC file format, uncompressed so it can be memory-mapped
+}
+
+# JSON columns hold free-form objects: keys map to JSON-encoded values so any
+# nesting survives, and a non-object document is stored under this key
+JSON_SCALAR_KEY = '$value'
+JSON_ARROW_TYPE = pa.map_(pa.string(), pa.string())
+
+
+def arrow_type(column):
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, JSON):
+        return JSON_ARROW_TYPE
+    if isinstance(column.type, (String, Text)):
+        return pa.string()
+    raise TypeError(f"No Arrow type for {column.name} ({column.type})")
+
+
+def arrow_schema(table):
+    return pa.schema([pa.field(column.name, arrow_type(column)) for column in table.columns])
+
+
+def _encode_json(value):
+    if value is None:
+        return None
+    if not isinstance(value, dict):
+        value = {JSON_SCALAR_KEY: value}
+    return [(str(key), json.dumps(item)) for key, item in value.items()]
+
+
+def _decode_json(entries):
+    if entries is None:
+        return None
+    value = {key: json.loads(item) for key, item in entries}
+    return value[JSON_SCALAR_KEY] if list(value) == [JSON_SCALAR_KEY] else value
+
+
+def _table_for(table_name):
+    if table_name not in IMPORT_TABLES:
+        raise ValueError(f"Unknown table: {table_name}")
+    return IMPORT_TABLES[table_name]
+
+
+def _record_batches(conn, table, schema, chunksize):
+    """Stream the table through a server-side cursor as Arrow record batches"""
+    result = conn.execution_options(stream_results=True).execute(select(table))
+    for rows in result.partitions(chunksize):
+        columns = list(zip(*rows))
+        arrays = []
+        for field, values in zip(schema, columns):
+            if field.type == JSON_ARROW_TYPE:
+                values = [_encode_json(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_table(bind, table_name, path, fmt='parquet', chunksize=COLUMNAR_CHUNKSIZE):
+    """Write a table to a Parquet or Arrow IPC file batch by batch; return the row count"""
+    table = _table_for(table_name)
+    schema = arrow_schema(table)
+    rows = 0
+    with bind.connect() as conn:
+        if fmt == 'parquet':
+            writer = pq.ParquetWriter(path, schema, compression='zstd')
+        elif fmt == 'arrow':
+            writer = ipc.new_file(path, schema)
+        else:
+            raise ValueError(f"Unknown format: {fmt}")
+        with writer:
+            for batch in _record_batches(conn, table, schema, chunksize):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    logger.info(f"Exported {rows} rows from {table_name} to {path}")
+    return rows
+
+
+def _read_batches(source, fmt, chunksize):
+    if fmt == 'parquet':
+        yield from pq.ParquetFile(source).iter_batches(batch_size=chunksize)
+    elif fmt == 'arrow':
+        reader = ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def import_table(bind, source, table_name, fmt='parquet', chunksize=COLUMNAR_CHUNKSIZE, progress=None):
+    """Load a Parquet or Arrow IPC file into a table in one transaction; return an ImportResult.
+
+    Only columns the table defines are imported, and JSON map columns are
+    decoded back to objects.
+    """
+    table = _table_for(table_name)
+    rows = 0
+    first_date = None
+    started = time.perf_counter()
+    with bind.begin() as conn:
+        for batch in _read_batches(source, fmt, chunksize):
+            names = [name for name in batch.schema.names if name in table.columns]
+            records = batch.select(names).to_pylist()
+            for name in names:
+                if isinstance(table.columns[name].type, JSON):
+                    for record in records:
+                        record[name] = _decode_json(record[name])
+            if not records:
+                continue
+            conn.execute(table.insert(), records)
+            rows += len(records)
+            if 'date' in names:
+                dates = [record['date'] for record in records if record['date'] is not None]
+                if dates:
+                    first_date = min(dates) if first_date is None else min(first_date, min(dates))
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress(rows, rows / elapsed if elapsed else 0.0)
+
+    result = ImportResult(table_name, rows, time.perf_counter() - started, first_date)
+    logger.info(f"Imported {result.rows} rows into {table_name} ({result.rows_per_sec:,.0f} rows/sec)")
+    return result
+
+
+def write_snapshot(bind, directory=SNAPSHOT_DIR, day=None):
+    """Export every table to <directory>/<day>/<table>.arrow; return the snapshot directory.
+
+    Files are written to a temporary directory that is renamed into place, so
+    readers never see a partial snapshot.
+    """
+    day = day or date.today()
+    target = os.path.join(directory, day.isoformat())
+    staging = f"{target}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for table_name in IMPORT_TABLES:
+        export_table(bind, table_name, os.path.join(staging, f"{table_name}.arrow"), fmt='arrow')
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    logger.info(f"Wrote snapshot {target}")
+    return target
+
+
+def latest_snapshot(directory=SNAPSHOT_DIR, max_age_days=SNAPSHOT_MAX_AGE_DAYS):
+    """Directory of the newest complete snapshot no older than max_age_days, or None"""
+    if not os.path.isdir(directory):
+        return None
+    oldest = date.today() - timedelta(days=max_age_days)
+    for name in sorted(os.listdir(directory), reverse=True):
+        try:
+            day = date.fromisoformat(name)
+        except ValueError:
+            continue  # staging directories and stray files
+        if day < oldest:
+            return None
+        return os.path.join(directory, name)
+    return None
+
+
+def read_snapshot(table_name, columns=None, directory=SNAPSHOT_DIR, max_age_days=SNAPSHOT_MAX_AGE_DAYS):
+    """Read a table from the latest snapshot through a memory map, or None if there is none.
+
+    Numeric columns are converted from the mapped file without copying through
+    the database driver; JSON map columns are decoded to objects.
+    """
+    snapshot = latest_snapshot(directory, max_age_days)
+    if snapshot is None:
+        return None
+    path = os.path.join(snapshot, f"{table_name}.arrow")
+    if not os.path.exists(path):
+        return None
+    with pa.memory_map(path) as source:
+        data = ipc.open_file(source).read_all()
+        if columns is not None:
+            data = data.select(columns)
+        frame = data.to_pandas(date_as_object=False)
+    for field in data.schema:
+        if field.type == JSON_ARROW_TYPE:
+            frame[field.name] = frame[field.name].map(_decode_json, na_action='ignore')
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar (Parquet / Arrow IPC) export, import and snapshots")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_cmd = commands.add_parser('export', help="Export a table")
+    export_cmd.add_argument('table', choices=list(IMPORT_TABLES))
+    export_cmd.add_argument('path')
+    export_cmd.add_argument('--format', choices=list(FORMATS), default='parquet')
+
+    import_cmd = commands.add_parser('import', help="Import a file into a table")
+    import_cmd.add_argument('table', choices=list(IMPORT_TABLES))
+    import_cmd.add_argument('path')
+    import_cmd.add_argument('--format', choices=list(FORMATS), default='parquet')
+
+    snapshot_cmd = commands.add_parser('snapshot', help="Write today's Arrow snapshot of every table")
+    snapshot_cmd.add_argument('--dir', default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from database import engine
+    if args.command == 'export':
+        export_table(engine, args.table, args.path, fmt=args.format)
+    elif args.command == 'import':
+        result = import_table(engine, args.path, args.table, fmt=args.format)
+        if args.table == 'sales' and result.rows:
+            from rollups import refresh_sales_rollups
+            refresh_sales_rollups(engine, since=result.first_date)
+    else:
+        write_snapshot(engine, directory=args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+
+# Keep tests off the configured database and the app's on-disk state; the
+# application modules read these when first imported
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['FORECAST_MODEL_DIR'] = ''
+os.environ['USE_SNAPSHOTS'] = '0'
+os.environ['ANALYTICS_PREWARM'] = '0'
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine on a fresh file-backed SQLite database with every model table created"""
+    from database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with sessionmaker(bind=engine)() as session:
+        yield session
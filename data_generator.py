@@ -1,95 +1,145 @@
+import argparse
+import logging
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from database import engine, Base, SessionLocal, Motorcycle, Sale, Customer
-
-def populate_database():
-    db = SessionLocal()
+from sqlalchemy import select, func
+from database import engine, Base, Motorcycle, Sale, Customer
+from rollups import refresh_sales_rollups
+
+logger = logging.getLogger(__name__)
+
+BRANDS = ['Honda', 'Yamaha', 'Kawasaki', 'Suzuki', 'Ducati', 'BMW', 'KTM']
+MODELS = ['Sport', 'Cruiser', 'Adventure', 'Touring', 'Naked']
+REGIONS = ['North', 'South', 'East', 'West', 'Central']
+CHANNELS = ['Online', 'Offline', 'Dealer']
+PROMOTIONS = ['Season Sale', 'Holiday Special', 'None', 'First Time Buyer']
+
+BATCH_SIZE = 50_000  # rows generated and committed per batch
+
+
+def _insert_generated(bind, table, generate, n, batch_size):
+    """Generate and insert n rows batch by batch, committing each batch.
+
+    generate(start, stop) returns equally sized column arrays for rows
+    start..stop, so only one batch is ever held in memory.
+    """
+    for start in range(0, n, batch_size):
+        stop = min(start + batch_size, n)
+        columns = generate(start, stop)
+        names = list(columns)
+        # tolist() converts NumPy scalars to native Python values for the driver
+        batch = [columns[name].tolist() for name in names]
+        with bind.begin() as conn:
+            conn.execute(table.insert(), [dict(zip(names, row)) for row in zip(*batch)])
+
+
+def generate_motorcycles(rng, n):
+    return {
+        'brand': rng.choice(BRANDS, n),
+        'model_type': rng.choice(MODELS, n),
+        'price': np.round(rng.uniform(5000, 25000, n), 2),
+        'year': rng.integers(2018, 2024, n),
+        'stock': rng.integers(0, 20, n)
+    }
+
+
+def generate_customers(rng, n):
+    return {
+        'lifetime_value': np.round(rng.uniform(5000, 100000, n), 2),
+        'purchases': rng.integers(1, 5, n),
+        'satisfaction_score': np.round(rng.uniform(3.0, 5.0, n), 1)
+    }
+
+
+def sale_dates(start, stop, total, end=None):
+    """Dates of sales start..stop out of `total` spread evenly over the year before `end`"""
+    end = pd.Timestamp(end or datetime.now())
+    first = end - timedelta(days=365)
+    step = (end - first).value / max(total - 1, 1)
+    offsets = np.arange(start, stop, dtype=np.float64) * step
+    return (first + pd.to_timedelta(offsets.astype(np.int64), unit='ns')).normalize()
+
+
+def generate_sales(rng, n, motorcycle_ids, customer_ids, dates):
+    """n sales on the given dates, referencing existing ids"""
+    return {
+        'date': dates.date,
+        'motorcycle_id': rng.choice(motorcycle_ids, n),
+        'customer_id': rng.choice(customer_ids, n),
+        'sales_amount': np.round(rng.uniform(5000, 30000, n), 2),
+        'units_sold': rng.integers(1, 5, n),
+        'customer_satisfaction': np.round(rng.uniform(3.5, 5.0, n), 1),
+        'sales_channel': rng.choice(CHANNELS, n),
+        'promotion_applied': rng.choice(PROMOTIONS, n),
+        'sales_region': rng.choice(REGIONS, n)
+    }
+
+
+def populate_database(n_motorcycles=100, n_customers=400, n_sales=500, seed=None,
+                      batch_size=BATCH_SIZE, bind=None):
+    """Fill empty tables with synthetic data, generated and committed in batches of batch_size rows.
+
+    Memory stays bounded by one batch whatever the row counts. The tables
+    count as populated once motorcycles exist, so an interrupted run is not
+    resumed.
+    """
+    bind = bind if bind is not None else engine
 
     # Ensure tables exist
-    Base.metadata.create_all(bind=engine)
-
-    # Check if data already exists
-    if db.query(Motorcycle).count() > 0:
-        db.close()
-        return
-
-    # Generate motorcycle data
-    brands = ['Honda', 'Yamaha', 'Kawasaki', 'Suzuki', 'Ducati', 'BMW', 'KTM']
-    models = ['Sport', 'Cruiser', 'Adventure', 'Touring', 'Naked']
-
-    for _ in range(100):
-        motorcycle = Motorcycle(
-            brand=np.random.choice(brands),
-            model_type=np.random.choice(models),
-            price=round(np.random.uniform(5000, 25000), 2),
-            year=np.random.randint(2018, 2024),
-            stock=np.random.randint(0, 20)
-        )
-        db.add(motorcycle)
-
-    # Commit motorcycles first
-    db.commit()
-
-    # Generate customer data
-    for _ in range(200):
-        customer = Customer(
-            lifetime_value=round(np.random.uniform(5000, 100000), 2),
-            purchases=np.random.randint(1, 5),
-            satisfaction_score=round(np.random.uniform(3.0, 5.0), 1)
-        )
-        db.add(customer)
-
-    # Commit customers before creating sales
-    db.commit()
-
-    # Commit motorcycles first
-    db.commit()
-
-    # Generate customer data
-    for _ in range(200):
-        customer = Customer(
-            lifetime_value=round(np.random.uniform(5000, 100000), 2),
-            purchases=np.random.randint(1, 5),
-            satisfaction_score=round(np.random.uniform(3.0, 5.0), 1)
-        )
-        db.add(customer)
-
-    # Commit customers before creating sales
-    db.commit()
-
-    # Get all motorcycles and customers for sales generation
-    motorcycles = db.query(Motorcycle).limit(100).all()
-    customers = db.query(Customer).limit(200).all()
-
-    # Generate sales data
-    dates = pd.date_range(
-        start=datetime.now() - timedelta(days=365),
-        end=datetime.now(),
-        periods=500
+    Base.metadata.create_all(bind=bind)
+
+    rng = np.random.default_rng(seed)
+    with bind.connect() as conn:
+        # Check if data already exists
+        if conn.scalar(select(func.count(Motorcycle.id))) > 0:
+            return
+
+    started = time.perf_counter()
+    _insert_generated(bind, Motorcycle.__table__, lambda start, stop: generate_motorcycles(rng, stop - start),
+                      n_motorcycles, batch_size)
+    _insert_generated(bind, Customer.__table__, lambda start, stop: generate_customers(rng, stop - start),
+                      n_customers, batch_size)
+
+    # Sales reference the ids the database actually assigned
+    with bind.connect() as conn:
+        motorcycle_ids = np.array(conn.scalars(select(Motorcycle.id)).all())
+        customer_ids = np.array(conn.scalars(select(Customer.id)).all())
+    end = datetime.now()
+    _insert_generated(
+        bind, Sale.__table__,
+        lambda start, stop: generate_sales(rng, stop - start, motorcycle_ids, customer_ids,
+                                           sale_dates(start, stop, n_sales, end)),
+        n_sales, batch_size
+    )
+
+    refresh_sales_rollups(bind)
+
+    logger.info(
+        f"Generated {n_motorcycles} motorcycles, {n_customers} customers and "
+        f"{n_sales} sales in {time.perf_counter() - started:.1f}s"
     )
-    regions = ['North', 'South', 'East', 'West', 'Central']
-    channels = ['Online', 'Offline', 'Dealer']
-    promotions = ['Season Sale', 'Holiday Special', 'None', 'First Time Buyer']
-
-    for date in dates:
-        motorcycle = np.random.choice(motorcycles)
-        customer = np.random.choice(customers)
-        sale = Sale(
-            date=date,
-            motorcycle_id=motorcycle.id,
-            customer_id=customer.id,
-            sales_amount=round(np.random.uniform(5000, 30000), 2),
-            units_sold=np.random.randint(1, 5),
-            customer_satisfaction=round(np.random.uniform(3.5, 5.0), 1),
-            sales_channel=np.random.choice(channels),
-            promotion_applied=np.random.choice(promotions),
-            sales_region=np.random.choice(regions)
-        )
-        db.add(sale)
-
-    db.commit()
-    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Populate the database with synthetic dealership data")
+    parser.add_argument('--motorcycles', type=int, default=100)
+    parser.add_argument('--customers', type=int, default=400)
+    parser.add_argument('--sales', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for reproducible datasets")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    populate_database(
+        n_motorcycles=args.motorcycles,
+        n_customers=args.customers,
+        n_sales=args.sales,
+        seed=args.seed,
+        batch_size=args.batch_size
+    )
+
 
 if __name__ == "__main__":
-    populate_database()
+    main()
@@ -1,10 +1,18 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey, JSON, Text, inspect
+from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, ForeignKey, JSON, Text, Index, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from contextlib import contextmanager
 import os
+import time
+import threading
 import logging
 from dotenv import load_dotenv
+from instrumentation import instrument_engine
+from profiling import profile_engine
 
 load_dotenv()
 
@@ -13,7 +21,52 @@ logger = logging.getLogger(__name__)
 # Get database URL from environment 
 DATABASE_URL = os.getenv("DATABASE_URL")  # MySQL URL
 
-engine = create_engine(DATABASE_URL)
+# Connection pool settings (ignored for SQLite, which uses SQLAlchemy's default pool)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # stay below MySQL's wait_timeout
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._wait_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._wait_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+def engine_options(url):
+    """Pool settings for create_engine, tuned per backend"""
+    options = {'pool_pre_ping': True}
+    if make_url(url).get_backend_name() != 'sqlite':
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE
+        )
+    return options
+
+engine = profile_engine(instrument_engine(create_engine(DATABASE_URL, **engine_options(DATABASE_URL))))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -26,6 +79,40 @@ def get_db():
     finally:
         db.close()
 
+@contextmanager
+def session_scope():
+    """Short-lived session that commits on success and always releases its connection"""
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def pool_status(bind=None):
+    """Snapshot of connection pool usage for the admin page"""
+    pool = (bind if bind is not None else engine).pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0)
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._wait_lock:
+            status.update(
+                checkouts=pool.checkouts,
+                checkout_timeouts=pool.checkout_timeouts,
+                avg_wait_ms=pool.total_wait / pool.checkouts * 1000 if pool.checkouts else 0.0,
+                max_wait_ms=pool.max_wait * 1000
+            )
+    return status
+
 def init_db():
     inspector = inspect(engine)
     if not inspector.has_table('users'):
@@ -33,6 +120,42 @@ def init_db():
         logger.info("Database tables created successfully")
     else:
         logger.info("Users table already exists, skipping creation.")
+    ensure_columns()
+    ensure_indexes()
+
+def ensure_columns(bind=None):
+    """Add any nullable model column missing from an existing table"""
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            logger.info(f"Added column {table.name}.{column.name}")
+
+def ensure_indexes(bind=None):
+    """Create any model-defined index missing from an existing database"""
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                try:
+                    index.create(bind)
+                except IntegrityError as e:
+                    # Rows violate a new unique index; rollups.py rebuilds its summary tables instead
+                    logger.warning(f"Could not create unique index {index.name}: {str(e)}")
+                    continue
+                logger.info(f"Created index {index.name}")
 
 sql_statements = [
     """
@@ -73,13 +196,24 @@ sql_statements = [
         phone VARCHAR(255),
         lifetime_value FLOAT,
         purchases INTEGER,
-        satisfaction_score FLOAT
+        satisfaction_score FLOAT,
+        segment VARCHAR(32),
+        segmented_lifetime_value FLOAT,
+        segmented_purchases INTEGER,
+        segmented_satisfaction_score FLOAT,
+        churn_risk_score FLOAT
     );
     """,
     """
     CREATE INDEX ix_customers_id ON customers(id);
     """,
     """
+    CREATE INDEX ix_customers_segment ON customers(segment);
+    """,
+    """
+    CREATE INDEX ix_customers_lifetime_value ON customers(lifetime_value);
+    """,
+    """
     CREATE TABLE sales (
         id INTEGER PRIMARY KEY,
         date DATE,
@@ -99,6 +233,18 @@ sql_statements = [
     CREATE INDEX ix_sales_id ON sales(id);
     """,
     """
+    CREATE INDEX ix_sales_date ON sales(date);
+    """,
+    """
+    CREATE INDEX ix_sales_customer_id_date ON sales(customer_id, date);
+    """,
+    """
+    CREATE INDEX ix_sales_motorcycle_id ON sales(motorcycle_id);
+    """,
+    """
+    CREATE INDEX ix_sales_region_date ON sales(sales_region, date);
+    """,
+    """
     CREATE TABLE market_data (
         id INTEGER PRIMARY KEY,
         date DATE,
@@ -112,6 +258,40 @@ sql_statements = [
     """,
     """
     CREATE INDEX ix_market_data_id ON market_data(id);
+    """,
+    """
+    CREATE TABLE sales_daily (
+        date DATE PRIMARY KEY,
+        sales_amount FLOAT,
+        units_sold INTEGER,
+        transactions INTEGER
+    );
+    """,
+    """
+    CREATE TABLE sales_rollup (
+        id INTEGER PRIMARY KEY,
+        date DATE,
+        sales_region VARCHAR(255),
+        sales_channel VARCHAR(255),
+        promotion_applied VARCHAR(255),
+        sales_amount FLOAT,
+        units_sold INTEGER,
+        transactions INTEGER,
+        satisfaction_total FLOAT
+    );
+    """,
+    """
+    CREATE INDEX ix_sales_rollup_date ON sales_rollup(date);
+    """,
+    """
+    CREATE UNIQUE INDEX ux_sales_rollup_key ON sales_rollup(date, sales_region, sales_channel, promotion_applied);
+    """,
+    """
+    CREATE TABLE rollup_state (
+        name VARCHAR(64) PRIMARY KEY,
+        refreshed_at DATETIME,
+        last_sale_id INTEGER
+    );
     """
 ]
 
@@ -149,6 +329,13 @@ class Sale(Base):
     motorcycle = relationship("Motorcycle")
     customer = relationship("Customer")
 
+    __table_args__ = (
+        Index('ix_sales_date', 'date'),  # forecast series, rollup refresh
+        Index('ix_sales_customer_id_date', 'customer_id', 'date'),  # churn join per customer
+        Index('ix_sales_motorcycle_id', 'motorcycle_id'),
+        Index('ix_sales_region_date', 'sales_region', 'date'),  # regional rollups
+    )
+
 class Customer(Base):
     __tablename__ = "customers"
 
@@ -157,9 +344,15 @@ class Customer(Base):
     last_name = Column(String(255))  # Add lastname field
     email = Column(String(255))  # Add email field
     phone = Column(String(255))  # Add phone field
-    lifetime_value = Column(Float, default=0.0)
+    lifetime_value = Column(Float, default=0.0, index=True)
     purchases = Column(Integer, default=0)
     satisfaction_score = Column(Float, default=0.0)
+    segment = Column(String(32), index=True)  # value tier assigned by segmentation.py
+    # Feature values the segment was assigned from; a customer whose features differ is relabelled
+    segmented_lifetime_value = Column(Float)
+    segmented_purchases = Column(Integer)
+    segmented_satisfaction_score = Column(Float)
+    churn_risk_score = Column(Float)  # 0-100, written by CRMAnalytics.score_churn_risk
 
 class MarketData(Base):
     __tablename__ = "market_data"
@@ -173,3 +366,38 @@ class MarketData(Base):
     economic_indicators = Column(JSON)  # GDP, disposable income, etc.
     seasonal_factors = Column(JSON)
     trend_indicators = Column(JSON)
+
+class SalesDaily(Base):
+    """Daily sales totals materialized from the sales table (see rollups.py)"""
+    __tablename__ = "sales_daily"
+
+    date = Column(Date, primary_key=True)
+    sales_amount = Column(Float)
+    units_sold = Column(Integer)
+    transactions = Column(Integer)
+
+class SalesRollup(Base):
+    """Sales totals per day, region, channel and promotion (see rollups.py)"""
+    __tablename__ = "sales_rollup"
+
+    id = Column(Integer, primary_key=True)
+    date = Column(Date, index=True)
+    sales_region = Column(String(255))
+    sales_channel = Column(String(255))
+    promotion_applied = Column(String(255))
+    sales_amount = Column(Float)
+    units_sold = Column(Integer)
+    transactions = Column(Integer)
+    satisfaction_total = Column(Float)  # sum of customer_satisfaction, for averages
+
+    __table_args__ = (
+        Index('ux_sales_rollup_key', 'date', 'sales_region', 'sales_channel', 'promotion_applied', unique=True),
+    )
+
+class RollupState(Base):
+    """One row per family of summary tables; refreshes lock it to run one at a time (see rollups.py)"""
+    __tablename__ = "rollup_state"
+
+    name = Column(String(64), primary_key=True)
+    refreshed_at = Column(DateTime)
+    last_sale_id = Column(Integer)  # highest sales.id reflected in the summaries
@@ -0,0 +1,132 @@
+import io
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import Integer, Float, Date, String, Text, JSON
+
+from database import Motorcycle, Customer, Sale, MarketData
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNKSIZE = int(os.getenv("IMPORT_CHUNKSIZE", "50000"))  # CSV rows per batch
+
+IMPORT_TABLES = {
+    'motorcycles': Motorcycle.__table__,
+    'customers': Customer.__table__,
+    'sales': Sale.__table__,
+    'market_data': MarketData.__table__
+}
+
+
+@dataclass
+class ImportResult:
+    table: str
+    rows: int
+    seconds: float
+    first_date: Optional[date] = None  # earliest value of the table's date column, if any
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class CSVImporter:
+    """Stream a CSV file into one of the dealership tables in bounded chunks.
+
+    Each chunk is coerced to the target table's column types and written with
+    the dialect's bulk path: COPY FROM STDIN on PostgreSQL, batched multi-row
+    INSERTs elsewhere. The whole file is imported in a single transaction.
+    """
+
+    def __init__(self, bind, chunksize=IMPORT_CHUNKSIZE, progress=None):
+        self.bind = bind
+        self.chunksize = chunksize
+        self.progress = progress  # optional callable(rows_imported, rows_per_sec)
+
+    def import_file(self, file, table_name):
+        if table_name not in IMPORT_TABLES:
+            raise ValueError(f"Unknown table: {table_name}")
+        table = IMPORT_TABLES[table_name]
+
+        rows = 0
+        first_date = None
+        started = time.perf_counter()
+        reader = pd.read_csv(file, chunksize=self.chunksize, dtype=str)
+        with self.bind.begin() as conn:
+            for chunk in reader:
+                df = self._coerce(chunk, table)
+                if df.empty:
+                    continue
+                self._write_chunk(conn, table, df)
+                rows += len(df)
+                if 'date' in df.columns and df['date'].notna().any():
+                    chunk_first = df['date'].dropna().min()
+                    first_date = chunk_first if first_date is None else min(first_date, chunk_first)
+                if self.progress:
+                    elapsed = time.perf_counter() - started
+                    self.progress(rows, rows / elapsed if elapsed else 0.0)
+
+        result = ImportResult(table_name, rows, time.perf_counter() - started, first_date)
+        logger.info(f"Imported {result.rows} rows into {table_name} ({result.rows_per_sec:,.0f} rows/sec)")
+        return result
+
+    def _coerce(self, chunk, table):
+        """Keep the table's columns and convert them to their schema types"""
+        unknown = [col for col in chunk.columns if col not in table.columns]
+        if unknown:
+            logger.warning(f"Ignoring columns not in {table.name}: {', '.join(unknown)}")
+
+        df = pd.DataFrame(index=chunk.index)
+        for column in table.columns:
+            if column.name not in chunk.columns:
+                continue
+            values = chunk[column.name]
+            if isinstance(column.type, Integer):
+                df[column.name] = pd.to_numeric(values, errors='coerce').astype('Int64')
+            elif isinstance(column.type, Float):
+                df[column.name] = pd.to_numeric(values, errors='coerce').astype('float64')
+            elif isinstance(column.type, Date):
+                df[column.name] = pd.to_datetime(values, errors='coerce').dt.date
+            elif isinstance(column.type, JSON):
+                df[column.name] = values.map(self._parse_json, na_action='ignore')
+            elif isinstance(column.type, (String, Text)):
+                df[column.name] = values
+
+            invalid = df[column.name].isna() & values.notna()
+            if invalid.any():
+                logger.warning(f"{int(invalid.sum())} invalid value(s) in {table.name}.{column.name} stored as NULL")
+        return df
+
+    @staticmethod
+    def _parse_json(value):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+
+    def _write_chunk(self, conn, table, df):
+        if conn.dialect.name == 'postgresql':
+            with conn.connection.driver_connection.cursor() as cursor:
+                if hasattr(cursor, 'copy_expert'):
+                    self._copy_chunk(cursor, table, df)
+                    return
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        conn.execute(table.insert(), records)
+
+    def _copy_chunk(self, cursor, table, df):
+        """Bulk load a chunk through psycopg2's COPY FROM STDIN"""
+        df = df.copy()
+        for column in df.columns:
+            if isinstance(table.columns[column].type, JSON):
+                df[column] = df[column].map(json.dumps, na_action='ignore')
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        columns = ', '.join(df.columns)
+        cursor.copy_expert(f"COPY {table.name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
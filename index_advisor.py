@@ -0,0 +1,132 @@
+import re
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+# name -> (SQL, sample parameters, tables a full scan of is inherent to the query)
+KNOWN_QUERIES = {
+    'churn_join': (
+        '''
+        SELECT c.satisfaction_score, a.last_purchase, a.recent_purchases
+        FROM customers c
+        LEFT JOIN (
+            SELECT customer_id, MAX(date) AS last_purchase,
+                   SUM(CASE WHEN date >= :since THEN 1 ELSE 0 END) AS recent_purchases
+            FROM sales GROUP BY customer_id
+        ) a ON a.customer_id = c.id
+        ''',
+        {'since': (datetime.now() - timedelta(days=365)).date()},
+        {'customers'}
+    ),
+    'customer_recent_sales': (
+        'SELECT COUNT(*) FROM sales WHERE customer_id = :customer_id AND date >= :since',
+        {'customer_id': 1, 'since': (datetime.now() - timedelta(days=90)).date()},
+        set()
+    ),
+    'forecast_daily_series': (
+        'SELECT date, SUM(sales_amount) FROM sales WHERE date >= :since GROUP BY date ORDER BY date',
+        {'since': (datetime.now() - timedelta(days=30)).date()},
+        set()
+    ),
+    'region_groupby': (
+        '''
+        SELECT sales_region, SUM(sales_amount) FROM sales
+        WHERE sales_region = :region AND date >= :since
+        GROUP BY sales_region
+        ''',
+        {'region': 'North', 'since': (datetime.now() - timedelta(days=365)).date()},
+        set()
+    ),
+    'login_lookup': (
+        'SELECT id, hashed_password FROM users WHERE username = :username',
+        {'username': 'admin'},
+        set()
+    ),
+}
+
+
+def explain(conn, sql, params):
+    """Return the plan as a list of text lines for the connection's dialect"""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+        return [row[-1] for row in rows]
+    rows = conn.execute(text(f"EXPLAIN {sql}"), params).mappings().all()
+    if dialect == 'postgresql':
+        return [row['QUERY PLAN'] for row in rows]
+    # MySQL/MariaDB: one row per table access
+    return [f"table={row['table']} type={row['type']} key={row['key']}" for row in rows]
+
+
+def full_scans(dialect, plan):
+    """Tables the plan reads without an index"""
+    scans = set()
+    for line in plan:
+        if dialect == 'sqlite':
+            match = re.match(r'\s*SCAN (?:TABLE )?(\w+)(?: AS \w+)?\s*$', line)
+        elif dialect == 'postgresql':
+            match = re.search(r'Seq Scan on (\w+)', line)
+        else:
+            match = re.match(r'table=(\w+) type=ALL', line)
+        if match:
+            scans.add(match.group(1))
+    return scans
+
+
+def resolve_aliases(sql, tables):
+    """Map query aliases (e.g. 'c') back to table names"""
+    aliases = dict(re.findall(r'\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?(\w+)', sql, flags=re.IGNORECASE))
+    reverse = {alias: table for table, alias in aliases.items()}
+    return {reverse.get(table, table) for table in tables}
+
+
+def advise(bind):
+    """Explain every known query; return {name: (plan, unexpected full scans or None on error)}"""
+    report = {}
+    with bind.connect() as conn:
+        for name, (sql, params, allowed) in KNOWN_QUERIES.items():
+            try:
+                plan = explain(conn, sql, params)
+            except Exception as e:
+                conn.rollback()
+                report[name] = ([str(e).splitlines()[0]], None)
+                continue
+            scans = resolve_aliases(sql, full_scans(conn.dialect.name, plan))
+            report[name] = (plan, scans - allowed)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run EXPLAIN on the app's hot queries and report full table scans")
+    parser.add_argument('--url', help="Database URL (defaults to DATABASE_URL)")
+    parser.add_argument('--strict', action='store_true', help="Exit non-zero if any unexpected full scan is found")
+    args = parser.parse_args()
+
+    if args.url:
+        bind = create_engine(args.url)
+    else:
+        from database import engine as bind
+
+    report = advise(bind)
+    problems = 0
+    for name, (plan, scans) in report.items():
+        if scans is None:
+            status = "EXPLAIN failed"
+        elif scans:
+            status = f"FULL SCAN: {', '.join(sorted(scans))}"
+            problems += 1
+        else:
+            status = "ok"
+        print(f"{name}: {status}")
+        for line in plan:
+            print(f"    {line}")
+
+    print(f"\n{problems} of {len(report)} queries need an index")
+    if args.strict and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
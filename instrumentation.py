@@ -0,0 +1,247 @@
+import os
+import re
+import sys
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from functools import lru_cache
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+QUERY_INSTRUMENTATION = os.getenv("QUERY_INSTRUMENTATION", "1") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))  # statements slower than this are logged
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")  # JSON-lines file for slow queries; the log stream if unset
+QUERY_STATS_MAX_STATEMENTS = int(os.getenv("QUERY_STATS_MAX_STATEMENTS", "500"))  # distinct statements tracked
+SLOW_QUERY_HISTORY = 100  # recent slow queries kept for the admin page
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf')]
+
+# Page being rendered by the current Streamlit script run; set by app.py
+current_page = ContextVar('current_page', default=None)
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames in these files are plumbing, not the code that asked for the query
+_SKIP_FILES = {os.path.join(_APP_DIR, name) for name in ('instrumentation.py', 'cache.py')}
+
+# Expanded IN lists and multi-row VALUES differ only in placeholder count
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+slow_query_logger = logging.getLogger('sql.slow')
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_query_logger.addHandler(_handler)
+    slow_query_logger.propagate = False
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement):
+    """Statement text used as the aggregation key"""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    return _PLACEHOLDER_LIST.sub('(?, ...)', statement)
+
+
+@lru_cache(maxsize=256)
+def _app_module(filename):
+    """Module name of an application source file, or None for library and plumbing code"""
+    if not filename.startswith(_APP_DIR) or filename in _SKIP_FILES:
+        return None
+    return os.path.splitext(os.path.relpath(filename, _APP_DIR))[0].replace(os.sep, '.')
+
+
+def calling_function():
+    """`module.qualname` of the innermost application frame on the stack"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = _app_module(frame.f_code.co_filename)
+        if module:
+            return f"{module}.{frame.f_code.co_qualname}"
+        frame = frame.f_back
+    return None
+
+
+class StatementStats:
+    """Latency histogram, row count and callers of one normalized statement"""
+
+    __slots__ = ('statement', 'calls', 'total_ms', 'max_ms', 'rows', 'rows_known', 'slow', 'buckets', 'callers', 'pages')
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.rows_known = 0  # executions whose driver reported a row count
+        self.slow = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.callers = {}
+        self.pages = {}
+
+    def record(self, elapsed_ms, rows, caller, page, slow):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        if rows is not None:
+            self.rows += rows
+            self.rows_known += 1
+        self.slow += slow
+        if caller:
+            self.callers[caller] = self.callers.get(caller, 0) + 1
+        if page:
+            self.pages[page] = self.pages.get(page, 0) + 1
+
+    def percentile(self, q):
+        return histogram_percentile(self.buckets, q, self.max_ms)
+
+
+def histogram_percentile(buckets, q, max_ms):
+    """Estimate a latency percentile (ms) by interpolating inside its bucket"""
+    buckets = np.asarray(buckets)
+    total = buckets.sum()
+    if not total:
+        return 0.0
+    cumulative = np.cumsum(buckets)
+    index = int(np.searchsorted(cumulative, q / 100 * total))
+    lower = LATENCY_BUCKETS_MS[index - 1] if index else 0.0
+    upper = min(LATENCY_BUCKETS_MS[index], max_ms)
+    below = cumulative[index - 1] if index else 0
+    fraction = (q / 100 * total - below) / buckets[index] if buckets[index] else 1.0
+    return float(lower + (max(upper, lower) - lower) * fraction)
+
+
+class QueryStats:
+    """Per-statement query telemetry collected from engine cursor events.
+
+    Statements are aggregated by their normalized SQL text. Each keeps a
+    fixed-bucket latency histogram, total rows where the driver reports them
+    (DML everywhere, SELECTs on buffered MySQL/PostgreSQL cursors; SQLite and
+    server-side cursors report none), and call counts per calling function and
+    per page. Statements slower than `slow_ms` are written as one JSON object
+    per line to the `sql.slow` logger. Latency covers statement execution;
+    rows streamed afterwards are fetched outside the timed window.
+    """
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, max_statements=QUERY_STATS_MAX_STATEMENTS):
+        self.slow_ms = slow_ms
+        self.max_statements = max_statements
+        self._statements = {}
+        self._recent_slow = deque(maxlen=SLOW_QUERY_HISTORY)
+        self._lock = threading.Lock()
+
+    def attach(self, bind):
+        """Listen to `bind`'s cursor events; safe to call more than once"""
+        if not event.contains(bind, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(bind, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(bind, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(bind, 'handle_error', self._handle_error)
+        return bind
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append((statement, time.perf_counter()))
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        _, started = conn.info['query_started'].pop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        rowcount = getattr(cursor, 'rowcount', -1)
+        self.record(
+            statement, elapsed_ms,
+            rows=rowcount if rowcount is not None and rowcount >= 0 else None,
+            caller=calling_function(),
+            page=current_page.get(),
+            executemany=executemany
+        )
+
+    def _handle_error(self, exception_context):
+        # A failed statement gets no after_cursor_execute; drop its start time so
+        # the connection's stack doesn't grow. Errors while fetching rows come
+        # after after_cursor_execute and find another statement (or nothing) on top.
+        conn = exception_context.connection
+        pending = conn.info.get('query_started') if conn is not None else None
+        if pending and pending[-1][0] == exception_context.statement:
+            pending.pop()
+
+    def record(self, statement, elapsed_ms, rows=None, caller=None, page=None, executemany=False):
+        key = normalize_statement(statement)
+        slow = elapsed_ms >= self.slow_ms
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                if len(self._statements) >= self.max_statements:
+                    key = '<other statements>'
+                    stats = self._statements.get(key)
+                if stats is None:
+                    stats = self._statements[key] = StatementStats(key)
+            stats.record(elapsed_ms, rows, caller, page, slow)
+        if slow:
+            entry = {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                'duration_ms': round(elapsed_ms, 3),
+                'rows': rows,
+                'caller': caller,
+                'page': page,
+                'executemany': executemany,
+                'statement': key
+            }
+            # Parameters are left out: they can hold credentials and customer data
+            with self._lock:
+                self._recent_slow.append(entry)
+            slow_query_logger.warning(json.dumps(entry))
+
+    def summary(self):
+        """One dict per statement, slowest total time first"""
+        with self._lock:
+            statements = list(self._statements.values())
+            rows = [{
+                'statement': stats.statement,
+                'calls': stats.calls,
+                'total_ms': stats.total_ms,
+                'mean_ms': stats.total_ms / stats.calls,
+                'p50_ms': stats.percentile(50),
+                'p95_ms': stats.percentile(95),
+                'max_ms': stats.max_ms,
+                'rows': stats.rows if stats.rows_known else None,
+                'slow': stats.slow,
+                'callers': ', '.join(sorted(stats.callers, key=stats.callers.get, reverse=True)),
+                'pages': ', '.join(sorted(stats.pages, key=stats.pages.get, reverse=True))
+            } for stats in statements]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def histogram(self):
+        """Calls per latency bucket across all statements, keyed by bucket label"""
+        with self._lock:
+            buckets = np.sum([stats.buckets for stats in self._statements.values()]
+                             or [[0] * len(LATENCY_BUCKETS_MS)], axis=0)
+        labels = [f"≤{bound:g} ms" for bound in LATENCY_BUCKETS_MS[:-1]] + [f">{LATENCY_BUCKETS_MS[-2]:g} ms"]
+        return dict(zip(labels, buckets.tolist()))
+
+    def recent_slow(self):
+        """Most recent slow queries, newest first"""
+        with self._lock:
+            return list(reversed(self._recent_slow))
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._recent_slow.clear()
+
+
+# Process-wide collector shared by all Streamlit sessions
+query_stats = QueryStats()
+
+
+def instrument_engine(bind):
+    """Attach query telemetry to an engine unless QUERY_INSTRUMENTATION=0"""
+    if QUERY_INSTRUMENTATION:
+        query_stats.attach(bind)
+    return bind
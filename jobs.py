@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", "2"))
+FORECAST_JOB_DIR = os.getenv("FORECAST_JOB_DIR", ".forecast_jobs")
+FORECAST_JOB_TIMEOUT = float(os.getenv("FORECAST_JOB_TIMEOUT", "900"))  # seconds before a running job is failed
+FORECAST_JOB_RETENTION = float(os.getenv("FORECAST_JOB_RETENTION", "86400"))  # seconds job records are kept
+FORECAST_JOB_PRUNE_INTERVAL = 600  # seconds between scans of the job directory
+FORECAST_JOB_RETRIES = 1  # resubmissions of a job whose worker died
+
+
+def run_forecast(periods, model_type, params, freq='D'):
+    """Worker entry point: fit the forecast on the worker's own database session"""
+    from database import session_scope
+    from analytics import DataAnalytics
+
+    with session_scope() as db:
+        return DataAnalytics(db).sales_forecast(periods=periods, model_type=model_type, params=params, freq=freq)
+
+
+class ForecastJobRunner:
+    """Run sales forecasts in a process pool and persist their results as JSON.
+
+    submit() returns a job id immediately; identical requests that are still
+    running share one job. Job records live on disk, so any Streamlit worker
+    process can poll a job by id, and records older than
+    FORECAST_JOB_RETENTION are deleted.
+
+    A worker that dies (out of memory, a crash inside Stan) breaks the whole
+    pool. The runner replaces the pool and resubmits each job that was on it
+    once. A job still running after FORECAST_JOB_TIMEOUT is failed and its
+    pool's workers are terminated so it stops holding a process slot; the
+    other jobs on that pool are resubmitted to a fresh one.
+    """
+
+    def __init__(self, max_workers=FORECAST_WORKERS, job_dir=FORECAST_JOB_DIR):
+        self.max_workers = max_workers
+        self.job_dir = job_dir
+        self._executor = None
+        self._active = {}  # request key -> job id
+        self._jobs = {}  # job id -> in-flight job submitted by this process
+        self._lock = threading.RLock()
+        self._last_prune = 0.0
+        os.makedirs(job_dir, exist_ok=True)
+        self.prune()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn avoids forking the Streamlit server's threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _discard_executor(self, executor, terminate=False):
+        """Stop using `executor` if it is still the current pool; the next submit starts a fresh one"""
+        with self._lock:
+            if executor is None or executor is not self._executor:
+                return
+            self._executor = None
+        if terminate:
+            # ProcessPoolExecutor has no public way to kill a busy worker before Python 3.14
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False)
+
+    def _start(self, job_id):
+        """Submit an in-flight job to the pool, replacing the pool once if it is already broken"""
+        job = self._jobs[job_id]
+        executor = self._get_executor()
+        try:
+            future = executor.submit(run_forecast, *job['args'])
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(run_forecast, *job['args'])
+        job.update(future=future, executor=executor)
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+
+    def submit(self, periods, model_type, params=None, freq='D'):
+        request = {'periods': periods, 'model_type': model_type, 'params': params, 'freq': freq}
+        key = json.dumps(request, sort_keys=True, default=str)
+        self._expire_jobs()
+        if time.time() - self._last_prune > FORECAST_JOB_PRUNE_INTERVAL:
+            self.prune()
+        with self._lock:
+            if key in self._active:
+                return self._active[key]
+            job_id = uuid.uuid4().hex
+            submitted_at = time.time()
+            self._write(job_id, {
+                'id': job_id,
+                'status': 'running',
+                'request': request,
+                'submitted_at': submitted_at
+            })
+            self._active[key] = job_id
+            self._jobs[job_id] = {
+                'key': key,
+                'args': (periods, model_type, params, freq),
+                'submitted_at': submitted_at,
+                'retries': 0
+            }
+            try:
+                self._start(job_id)
+            except BrokenProcessPool as e:
+                self._close(job_id, status='failed', error=f"Forecast workers are unavailable: {str(e)}")
+                return job_id
+        logger.info(f"Submitted forecast job {job_id} ({model_type}, {periods} periods)")
+        return job_id
+
+    def _finish(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.get('future') is not future:
+                return  # already failed by the timeout
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                self._discard_executor(job['executor'])
+                if job['retries'] < FORECAST_JOB_RETRIES:
+                    job['retries'] += 1
+                    logger.warning(f"Forecast job {job_id} lost its worker; resubmitting")
+                    try:
+                        self._start(job_id)
+                        return
+                    except BrokenProcessPool:
+                        pass
+                logger.error(f"Forecast job {job_id} failed: its worker process died")
+                self._close(job_id, status='failed', error="The forecast worker stopped unexpectedly; please retry")
+            except Exception as e:
+                logger.error(f"Forecast job {job_id} failed: {str(e)}")
+                self._close(job_id, status='failed', error=str(e))
+            else:
+                self._close(job_id, status='done', result=result)
+
+    def _close(self, job_id, **fields):
+        """Write the job's final record and forget it; caller holds self._lock"""
+        job = self._jobs.pop(job_id)
+        self._active.pop(job['key'], None)
+        record = self.get(job_id, expire=False) or {'id': job_id}
+        record.pop('error', None)
+        record.update(fields, finished_at=time.time())
+        self._write(job_id, record)
+
+    def _expire_jobs(self):
+        """Fail jobs running past FORECAST_JOB_TIMEOUT and terminate the workers they hold"""
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if now - job['submitted_at'] > FORECAST_JOB_TIMEOUT]
+            executors = {id(self._jobs[job_id]['executor']): self._jobs[job_id]['executor'] for job_id in expired}
+            for job_id in expired:
+                logger.error(f"Forecast job {job_id} timed out after {FORECAST_JOB_TIMEOUT:.0f}s")
+                self._close(job_id, status='failed', error='Forecast job timed out')
+            for executor in executors.values():
+                self._discard_executor(executor, terminate=True)
+
+    def get(self, job_id, expire=True):
+        """Return the job record, or None if the id is unknown"""
+        if expire:
+            self._expire_jobs()
+        try:
+            with open(self._path(job_id)) as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        if record['status'] == 'running' and time.time() - record['submitted_at'] > FORECAST_JOB_TIMEOUT:
+            # Submitted by another process that has since been restarted
+            record['status'] = 'failed'
+            record['error'] = 'Forecast job timed out or its worker was restarted'
+        return record
+
+    def prune(self, max_age=FORECAST_JOB_RETENTION):
+        """Delete job records last written more than max_age seconds ago; return how many"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            in_flight = set(self._jobs)
+            self._last_prune = time.time()
+        removed = 0
+        for entry in os.scandir(self.job_dir):
+            if entry.name.split('.', 1)[0] in in_flight:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass  # pruned concurrently by another process
+        if removed:
+            logger.info(f"Pruned {removed} forecast job record(s) older than {max_age:.0f}s")
+        return removed
+
+    def _path(self, job_id):
+        return os.path.join(self.job_dir, f"{os.path.basename(job_id)}.json")
+
+    def _write(self, job_id, record):
+        path = self._path(job_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, default=str)
+        os.replace(tmp_path, path)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Process-wide runner shared by all Streamlit sessions"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = ForecastJobRunner()
+        return _runner
@@ -0,0 +1,149 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORECAST_MODEL_CACHE_SIZE = int(os.getenv("FORECAST_MODEL_CACHE_SIZE", "16"))
+# Shared on-disk store so every forecast worker process reuses a fit; set to "" to disable
+FORECAST_MODEL_DIR = os.getenv("FORECAST_MODEL_DIR", ".forecast_models") or None
+FORECAST_MODEL_DISK_LIMIT = int(os.getenv("FORECAST_MODEL_DISK_LIMIT", "64"))  # models kept on disk
+
+
+def fingerprint_series(df):
+    """Identify a training frame by row count, last date and a content checksum"""
+    checksum = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+    last_date = df.iloc[:, 0].max() if len(df) else None
+    return f"{len(df)}:{last_date}:{checksum[:16]}"
+
+
+def _dump_prophet(model, path):
+    from prophet.serialize import model_to_json
+    with open(path, 'w') as f:
+        f.write(model_to_json(model))
+
+
+def _load_prophet(path):
+    from prophet.serialize import model_from_json
+    with open(path) as f:
+        return model_from_json(f.read())
+
+
+def _dump_pickle(model, path):
+    with open(path, 'wb') as f:
+        pickle.dump(model, f)
+
+
+def _load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+SERIALIZERS = {
+    'prophet': ('json', _dump_prophet, _load_prophet)
+}
+DEFAULT_SERIALIZER = ('pkl', _dump_pickle, _load_pickle)
+
+
+class ModelStore:
+    """LRU cache of fitted forecast models keyed by training data and parameters.
+
+    A fitted model can forecast any horizon, so changing only the number of
+    periods reuses it instead of refitting. When `directory` is set, models
+    are also serialized to disk so the other forecast worker processes load
+    them instead of refitting; the least recently used files beyond
+    `disk_limit` are deleted. Only point `directory` at a location the app
+    alone can write to, because non-Prophet models are stored as pickles.
+    """
+
+    def __init__(self, maxsize=FORECAST_MODEL_CACHE_SIZE, directory=FORECAST_MODEL_DIR,
+                 disk_limit=FORECAST_MODEL_DISK_LIMIT):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.disk_limit = disk_limit
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, model_type, df, params):
+        payload = json.dumps([model_type, fingerprint_series(df), params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_or_fit(self, model_type, df, params, fit):
+        """Return the cached model for (model_type, df, params), calling fit() on a miss"""
+        key = self.key(model_type, df, params)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+        model = self._load(model_type, key)
+        if model is None:
+            model = fit()
+            self._save(model_type, key, model)
+
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.maxsize:
+                self._models.popitem(last=False)
+        return model
+
+    def _path(self, model_type, key):
+        extension = SERIALIZERS.get(model_type, DEFAULT_SERIALIZER)[0]
+        return os.path.join(self.directory, f"{model_type}-{key}.{extension}")
+
+    def _load(self, model_type, key):
+        if not self.directory:
+            return None
+        path = self._path(model_type, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            model = SERIALIZERS.get(model_type, DEFAULT_SERIALIZER)[2](path)
+            os.utime(path)  # recently used models survive pruning
+            return model
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cached model {path}: {str(e)}")
+            return None
+
+    def _save(self, model_type, key, model):
+        if not self.directory:
+            return
+        path = self._path(model_type, key)
+        try:
+            SERIALIZERS.get(model_type, DEFAULT_SERIALIZER)[1](model, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+        except Exception as e:
+            logger.warning(f"Could not persist fitted {model_type} model: {str(e)}")
+            return
+        self._prune()
+
+    def _prune(self):
+        """Delete the least recently used model files beyond disk_limit"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass  # pruned concurrently by another process
+        for _, path in sorted(entries, reverse=True)[self.disk_limit:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+# Process-wide store; each forecast worker process has its own in-memory LRU in front of the shared directory
+model_store = ModelStore()
@@ -2,11 +2,21 @@ from sqlalchemy.orm import Session
 from sqlalchemy import JSON, Text, create_engine, Column, Integer, String, Float, Date, ForeignKey
 from sqlalchemy.orm import relationship, declarative_base, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import func
+from sqlalchemy import func, select, true
+from dataclasses import dataclass, fields
+import os
+import logging
 from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
 from database import Motorcycle, Sale, Customer
+from cache import cached
+from profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+LOADER_CHUNKSIZE = 50_000  # rows fetched per round trip by the DataFrame loaders
+USE_SNAPSHOTS = os.getenv("USE_SNAPSHOTS", "0") == "1"  # read loader frames from Arrow snapshots (columnar.py)
 
 Base = declarative_base()
 
@@ -63,74 +73,188 @@ class MarketData(Base):
     seasonal_factors = Column(JSON)
     trend_indicators = Column(JSON)
 
+@dataclass(frozen=True)
+class KPISnapshot:
+    """Dashboard aggregates for inventory, sales and customers"""
+    total_inventory: int = 0
+    avg_price: float = 0.0
+    total_sales: float = 0.0
+    avg_satisfaction: float = 0.0
+    total_units: int = 0
+    total_customers: int = 0
+    avg_ltv: float = 0.0
+    avg_purchases: float = 0.0
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a snapshot from an aggregate row, treating NULL aggregates as zero"""
+        return cls(**{
+            field.name: field.type(row[field.name] or 0)
+            for field in fields(cls) if field.name in row
+        })
+
+    def inventory_metrics(self):
+        return {
+            'total_inventory': self.total_inventory,
+            'avg_price': self.avg_price
+        }
+
+    def sales_metrics(self):
+        return {
+            'total_sales': self.total_sales,
+            'avg_satisfaction': self.avg_satisfaction,
+            'total_units': self.total_units
+        }
+
+    def customer_metrics(self):
+        return {
+            'avg_ltv': self.avg_ltv,
+            'total_customers': self.total_customers,
+            'avg_purchases': self.avg_purchases
+        }
+
 class MotorcycleDSS:
     def __init__(self, db: Session):
         self.db = db
 
+    def _inventory_aggregates(self):
+        return select(
+            func.count(Motorcycle.id).label('total_inventory'),
+            func.avg(Motorcycle.price).label('avg_price')
+        )
+
+    def _sales_aggregates(self):
+        return select(
+            func.sum(Sale.sales_amount).label('total_sales'),
+            func.avg(Sale.customer_satisfaction).label('avg_satisfaction'),
+            func.sum(Sale.units_sold).label('total_units')
+        )
+
+    def _customer_aggregates(self):
+        return select(
+            func.count(Customer.id).label('total_customers'),
+            func.avg(Customer.lifetime_value).label('avg_ltv'),
+            func.avg(Customer.purchases).label('avg_purchases')
+        )
+
+    @cached('motorcycles', 'sales', 'customers')
+    def get_kpi_snapshot(self):
+        """Compute every dashboard aggregate in a single round trip"""
+        inventory = self._inventory_aggregates().subquery()
+        sales = self._sales_aggregates().subquery()
+        customers = self._customer_aggregates().subquery()
+        # Each subquery yields exactly one row, so the join is a 1x1x1 product
+        stmt = select(inventory, sales, customers).select_from(
+            inventory.join(sales, true()).join(customers, true())
+        )
+        return KPISnapshot.from_row(self.db.execute(stmt).one()._mapping)
+
+    @cached('motorcycles')
     def get_inventory_metrics(self):
         try:
-            print("Fetching inventory metrics...") # Debug print
-            total_inventory = self.db.query(Motorcycle).count()
-            avg_price = self.db.query(func.avg(Motorcycle.price)).scalar()
-            print("Inventory metrics fetched successfully.") # Debug print
-            return {
-                'total_inventory': total_inventory,
-                'avg_price': avg_price if avg_price else 0  # Handle potential None
-            }
-        except Exception as e:
-            print(f"Error fetching inventory metrics: {e}") # Error print
+            row = self.db.execute(self._inventory_aggregates()).one()._mapping
+            return KPISnapshot.from_row(row).inventory_metrics()
+        except Exception:
+            logger.exception("Error fetching inventory metrics")
             raise # Re-raise the exception to be caught in app.py
-    
-    def get_sales_metrics(self):
-        total_sales = self.db.query(func.sum(Sale.sales_amount)).scalar() or 0
-        avg_satisfaction = self.db.query(func.avg(Sale.customer_satisfaction)).scalar() or 0
-        total_units = self.db.query(func.sum(Sale.units_sold)).scalar() or 0
 
-        return {
-            'total_sales': float(total_sales),
-            'avg_satisfaction': float(avg_satisfaction),
-            'total_units': total_units
-        }
+    @cached('sales')
+    def get_sales_metrics(self):
+        row = self.db.execute(self._sales_aggregates()).one()._mapping
+        return KPISnapshot.from_row(row).sales_metrics()
 
+    @cached('customers')
     def get_customer_metrics(self):
-        avg_ltv = self.db.query(func.avg(Customer.lifetime_value)).scalar() or 0
-        total_customers = self.db.query(Customer).count()
-        avg_purchases = self.db.query(func.avg(Customer.purchases)).scalar() or 0
+        row = self.db.execute(self._customer_aggregates()).one()._mapping
+        return KPISnapshot.from_row(row).customer_metrics()
 
-        return {
-            'avg_ltv': float(avg_ltv),
-            'total_customers': total_customers,
-            'avg_purchases': float(avg_purchases)
-        }
+    @profiled('db')
+    def _read_frame(self, stmt, dtypes, sort_by=None):
+        """Stream a column-projected SELECT into a DataFrame with explicit dtypes.
+
+        With USE_SNAPSHOTS=1 the columns come from the latest Arrow snapshot
+        (see columnar.py) when one is recent enough, sorted by `sort_by`.
+        """
+        if USE_SNAPSHOTS:
+            frame = self._read_snapshot_frame(stmt, dtypes, sort_by)
+            if frame is not None:
+                return frame
+        date_columns = [col for col, dtype in dtypes.items() if dtype == 'datetime64[ns]']
+        value_dtypes = {col: dtype for col, dtype in dtypes.items() if col not in date_columns}
+        # On the run's session connection; stream_results is set per statement because
+        # Connection.execution_options() would change the session's connection in place
+        chunks = list(pd.read_sql(
+            stmt.execution_options(stream_results=True), self.db.connection(),
+            chunksize=LOADER_CHUNKSIZE,
+            dtype=value_dtypes,
+            parse_dates=date_columns
+        ))
+        if not chunks:
+            return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+        return pd.concat(chunks, ignore_index=True)
+
+    def _read_snapshot_frame(self, stmt, dtypes, sort_by):
+        from columnar import read_snapshot  # pyarrow is loaded only when snapshots are enabled
+
+        table_name = stmt.get_final_froms()[0].name
+        # Output name -> snapshot column, following labels such as Customer.id.label('customer_id')
+        sources = {column.name: getattr(column, 'element', column).name for column in stmt.selected_columns}
+        frame = read_snapshot(table_name, columns=list(dict.fromkeys(sources.values())))
+        if frame is None:
+            return None
+        frame = pd.DataFrame({name: frame[source] for name, source in sources.items()}).astype(dtypes)
+        if sort_by:
+            frame = frame.sort_values(sort_by, kind='stable', ignore_index=True)
+        return frame
 
+    @cached('sales')
     def get_sales_data(self):
-        sales = self.db.query(Sale).all()
-        return pd.DataFrame([{
-            'date': sale.date,
-            'sales_amount': sale.sales_amount,
-            'units_sold': sale.units_sold,
-            'customer_satisfaction': sale.customer_satisfaction
-        } for sale in sales])
+        stmt = select(
+            Sale.date,
+            Sale.sales_amount,
+            Sale.units_sold,
+            Sale.customer_satisfaction
+        ).order_by(Sale.date)
+        return self._read_frame(stmt, {
+            'date': 'datetime64[ns]',
+            'sales_amount': 'float64',
+            'units_sold': 'Int64',
+            'customer_satisfaction': 'float64'
+        }, sort_by='date')
 
+    @cached('motorcycles')
     def get_inventory_data(self):
-        inventory = self.db.query(Motorcycle).all()
-        return pd.DataFrame([{
-            'id': moto.id,
-            'brand': moto.brand,
-            'model_type': moto.model_type,
-            'price': moto.price,
-            'year': moto.year,
-            'stock': moto.stock
-        } for moto in inventory])
+        stmt = select(
+            Motorcycle.id,
+            Motorcycle.brand,
+            Motorcycle.model_type,
+            Motorcycle.price,
+            Motorcycle.year,
+            Motorcycle.stock
+        ).order_by(Motorcycle.id)
+        return self._read_frame(stmt, {
+            'id': 'int64',
+            'brand': 'string',
+            'model_type': 'string',
+            'price': 'float64',
+            'year': 'Int64',
+            'stock': 'Int64'
+        }, sort_by='id')
 
+    @cached('customers')
     def get_customer_data(self):
-        customers = self.db.query(Customer).all()
-        return pd.DataFrame([{
-            'customer_id': cust.id,
-            'lifetime_value': cust.lifetime_value,
-            'purchases': cust.purchases,
-            'satisfaction_score': cust.satisfaction_score
-        } for cust in customers])
+        stmt = select(
+            Customer.id.label('customer_id'),
+            Customer.lifetime_value,
+            Customer.purchases,
+            Customer.satisfaction_score
+        ).order_by(Customer.id)
+        return self._read_frame(stmt, {
+            'customer_id': 'int64',
+            'lifetime_value': 'float64',
+            'purchases': 'Int64',
+            'satisfaction_score': 'float64'
+        }, sort_by='customer_id')
 
     def forecast_sales(self, periods=30):
         daily_sales = self.get_sales_data()
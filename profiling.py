@@ -0,0 +1,236 @@
+import os
+import time
+import logging
+import threading
+import cProfile
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+
+import numpy as np
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Off by default; "1" times phases, "cprofile" / "pyinstrument" also dump a profile per rerun.
+# The ?profile=... query parameter selects the same modes for one browser session.
+PROFILE_PAGES = os.getenv("PROFILE_PAGES", "0")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "500"))  # renders kept per page for percentiles
+
+PROFILE_MODES = ('1', 'cprofile', 'pyinstrument')
+PHASES = ['db', 'analytics', 'figure', 'serialize', 'other']  # 'other' is script time outside any phase
+
+# Profile of the Streamlit script run on this thread, if profiling is on
+current_render = ContextVar('current_render', default=None)
+
+
+def profile_mode(query_value=None):
+    """Profiling mode for a run from the query parameter, falling back to PROFILE_PAGES; None when off"""
+    for mode in (query_value, PROFILE_PAGES):
+        if mode in PROFILE_MODES:
+            return mode
+    return None
+
+
+class RenderProfile:
+    """Wall time of one script run split into phases.
+
+    Phases nest: entering a phase pauses the enclosing one, so every second
+    is attributed to exactly one phase (exclusive time) and the phases sum
+    to the run's total.
+    """
+
+    def __init__(self, page=None, mode='1'):
+        self.page = page
+        self.mode = mode
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self._stack = ['other']
+        self._statements = []  # statements in flight on the 'db' phase, innermost last
+        self._started = self._mark = time.perf_counter()
+        self.total = None
+        self._profiler = None
+        if mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+        elif mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+                self._profiler = Profiler()
+            except ImportError:
+                logger.warning("pyinstrument is not installed; timing phases without a profile dump")
+        if self._profiler is not None:
+            try:
+                self._profiler.enable() if mode == 'cprofile' else self._profiler.start()
+            except (ValueError, RuntimeError) as e:
+                # Another profiler already owns this thread
+                logger.warning(f"Could not start {mode}: {str(e)}")
+                self._profiler = None
+
+    def _switch(self, now):
+        self.seconds[self._stack[-1]] += now - self._mark
+        self._mark = now
+
+    def enter(self, phase):
+        self._switch(time.perf_counter())
+        self._stack.append(phase)
+
+    def exit(self):
+        self._switch(time.perf_counter())
+        if len(self._stack) > 1:  # the base 'other' phase stays
+            self._stack.pop()
+
+    @property
+    def phase(self):
+        return self._stack[-1]
+
+    def finish(self, directory=PROFILE_DIR):
+        """Close the run; return its phase seconds and the path of any profile dump"""
+        now = time.perf_counter()
+        self._switch(now)
+        self.total = now - self._started
+        dump = None
+        if self._profiler is not None:
+            dump = self._dump(directory)
+        return dict(self.seconds), dump
+
+    def abandon(self):
+        """Stop the profiler of a run that ended early (st.stop / st.rerun) without recording it"""
+        if self._profiler is not None:
+            self._profiler.disable() if self.mode == 'cprofile' else self._profiler.stop()
+            self._profiler = None
+
+    def _dump(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        name = ''.join(ch if ch.isalnum() else '_' for ch in (self.page or 'page')).strip('_') or 'page'
+        stem = os.path.join(directory, f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}")
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+            path = f"{stem}.prof"
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.stop()
+            path = f"{stem}.html"
+            with open(path, 'w') as f:
+                f.write(self._profiler.output_html())
+        return path
+
+
+@contextmanager
+def profile_phase(phase):
+    """Attribute the enclosed code to `phase` in the current run's profile; no-op when off"""
+    render = current_render.get()
+    if render is None:
+        yield
+        return
+    render.enter(phase)
+    try:
+        yield
+    finally:
+        render.exit()
+
+
+def profiled(phase):
+    """Decorator form of profile_phase"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_phase(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    render = current_render.get()
+    if render is not None:
+        render.enter('db')
+        render._statements.append(statement)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    render = current_render.get()
+    if render is not None and render.phase == 'db' and render._statements:
+        render._statements.pop()
+        render.exit()
+
+
+def _handle_error(exception_context):
+    # A failed statement gets no after_cursor_execute, so leave its 'db' phase
+    # here. Errors while fetching rows come after after_cursor_execute and must
+    # not pop the enclosing phase (e.g. the @profiled('db') loader reading them).
+    render = current_render.get()
+    if render is None or render.phase != 'db' or not render._statements:
+        return
+    if render._statements[-1] == exception_context.statement:
+        render._statements.pop()
+        render.exit()
+
+
+def profile_engine(bind):
+    """Count statement execution on `bind` as the 'db' phase of profiled runs"""
+    if not event.contains(bind, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(bind, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(bind, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(bind, 'handle_error', _handle_error)
+    return bind
+
+
+class PageTimings:
+    """Recent phase timings per page from every session in the process"""
+
+    def __init__(self, history=PROFILE_HISTORY):
+        self.history = history
+        self._renders = {}  # page -> deque of {phase: seconds, 'total': seconds}
+        self._lock = threading.Lock()
+
+    def record(self, page, seconds, total):
+        with self._lock:
+            renders = self._renders.setdefault(page, deque(maxlen=self.history))
+            renders.append({**seconds, 'total': total})
+
+    def summary(self):
+        """p50 / p95 milliseconds per page and phase"""
+        with self._lock:
+            renders = {page: list(items) for page, items in self._renders.items()}
+        rows = []
+        for page, items in sorted(renders.items()):
+            for phase in PHASES + ['total']:
+                values = np.array([item[phase] for item in items]) * 1000
+                rows.append({
+                    'page': page,
+                    'phase': phase,
+                    'renders': len(values),
+                    'p50_ms': float(np.percentile(values, 50)),
+                    'p95_ms': float(np.percentile(values, 95)),
+                    'mean_ms': float(values.mean())
+                })
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._renders.clear()
+
+
+# Process-wide timings shared by all Streamlit sessions
+page_timings = PageTimings()
+
+
+def start_render(mode):
+    """Begin profiling this thread's script run; return the profile, or None when off"""
+    previous = current_render.get()
+    if previous is not None:
+        previous.abandon()
+    render = RenderProfile(mode=mode) if mode else None
+    current_render.set(render)
+    return render
+
+
+def finish_render(render, page):
+    """Record a finished run in page_timings; return (phase seconds, total, dump path)"""
+    current_render.set(None)
+    render.page = page
+    seconds, dump = render.finish()
+    page_timings.record(page, seconds, render.total)
+    return seconds, render.total, dump
@@ -0,0 +1,184 @@
+import logging
+
+from sqlalchemy import select, insert, update, func, inspect
+from sqlalchemy.exc import IntegrityError
+
+from database import Sale, SalesDaily, SalesRollup, RollupState
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLES = [SalesDaily.__table__, SalesRollup.__table__]
+ROLLUP_STATE = 'sales'  # RollupState row locked by sales rollup refreshes
+
+
+def _table_current(inspector, table):
+    """Whether `table` exists with all of its model columns and indexes"""
+    if not inspector.has_table(table.name):
+        return False
+    columns = {column['name'] for column in inspector.get_columns(table.name)}
+    indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+    return all(column.name in columns for column in table.columns) and \
+        all(index.name in indexes for index in table.indexes)
+
+
+def _ensure_tables(conn):
+    """Create the summary tables, rebuilding any that predate one of their columns or indexes.
+
+    They hold nothing but aggregates of `sales` and refresh bookkeeping, so
+    an outdated table (which may hold duplicate rows, lacking the unique
+    key) is dropped, and the next refresh fills it again from scratch.
+    """
+    inspector = inspect(conn)
+    for table in ROLLUP_TABLES + [RollupState.__table__]:
+        if _table_current(inspector, table):
+            continue
+        if inspector.has_table(table.name):
+            logger.info(f"Rebuilding {table.name} with its current schema")
+            table.drop(conn)
+        table.create(conn, checkfirst=True)
+
+
+def _ensure_state_row(bind):
+    with bind.connect() as conn:
+        if conn.scalar(select(RollupState.name).where(RollupState.name == ROLLUP_STATE)) is not None:
+            return
+    try:
+        with bind.begin() as conn:
+            conn.execute(insert(RollupState).values(name=ROLLUP_STATE))
+    except IntegrityError:
+        pass  # created concurrently by another process
+
+
+def _lock_refreshes(conn):
+    """Hold the state row's lock until this transaction ends; return its last_sale_id.
+
+    An UPDATE as the transaction's first statement takes the row lock on
+    MySQL and Postgres and the database write lock on SQLite, so concurrent
+    refreshes queue up and each re-aggregates committed data instead of
+    interleaving its delete and insert with another's.
+    """
+    state = RollupState.name == ROLLUP_STATE
+    conn.execute(update(RollupState).where(state).values(refreshed_at=func.now()))
+    return conn.scalar(select(RollupState.last_sale_id).where(state))
+
+
+def _set_high_water(conn, last_sale_id):
+    conn.execute(
+        update(RollupState).where(RollupState.name == ROLLUP_STATE).values(last_sale_id=last_sale_id)
+    )
+
+
+def _first_date_after(conn, last_sale_id):
+    """Earliest date among sales added after the high-water mark, whatever their date"""
+    return conn.scalar(select(func.min(Sale.date)).where(Sale.id > last_sale_id))
+
+
+def _daily_aggregate():
+    return select(
+        Sale.date,
+        func.sum(Sale.sales_amount),
+        func.sum(Sale.units_sold),
+        func.count(Sale.id)
+    ).where(Sale.date.isnot(None)).group_by(Sale.date)
+
+
+def _rollup_aggregate():
+    dimensions = [Sale.date, Sale.sales_region, Sale.sales_channel, Sale.promotion_applied]
+    return select(
+        *dimensions,
+        func.sum(Sale.sales_amount),
+        func.sum(Sale.units_sold),
+        func.count(Sale.id),
+        func.sum(Sale.customer_satisfaction)
+    ).where(Sale.date.isnot(None)).group_by(*dimensions)
+
+
+def refresh_sales_rollups(bind, since=None):
+    """Recompute the sales summary tables for dates on or after `since`.
+
+    With since=None every row is rebuilt. Writers call this with the earliest
+    sale date they touched, so only the affected days are re-aggregated;
+    `since` is moved back to cover any other sales added since the last
+    refresh. Sales without a date are left out of the summaries.
+    """
+    refreshes = [
+        (SalesDaily.__table__, _daily_aggregate(),
+         ['date', 'sales_amount', 'units_sold', 'transactions']),
+        (SalesRollup.__table__, _rollup_aggregate(),
+         ['date', 'sales_region', 'sales_channel', 'promotion_applied',
+          'sales_amount', 'units_sold', 'transactions', 'satisfaction_total'])
+    ]
+    with bind.begin() as conn:
+        _ensure_tables(conn)
+    _ensure_state_row(bind)
+    with bind.begin() as conn:
+        last_sale_id = _lock_refreshes(conn)
+        # Read before aggregating: sales committed meanwhile are caught up next time
+        high_water = conn.scalar(select(func.max(Sale.id)))
+        if last_sale_id is None:
+            since = None  # nothing recorded about what the summaries hold
+        elif since is not None:
+            pending = _first_date_after(conn, last_sale_id)
+            if pending is not None and pending < since:
+                since = pending
+        for table, aggregate, columns in refreshes:
+            delete = table.delete()
+            if since is not None:
+                aggregate = aggregate.where(Sale.date >= since)
+                delete = delete.where(table.c.date >= since)
+            conn.execute(delete)
+            conn.execute(table.insert().from_select(columns, aggregate))
+        _set_high_water(conn, high_water)
+    logger.info(f"Refreshed sales rollups since {since or 'the beginning'}")
+
+
+def _catch_up_needed(conn):
+    """Read-only check of what ensure_sales_rollups has to do.
+
+    Returns None when the tables are up to date, else ('full', None),
+    ('since', earliest pending date) or ('undated', sales.id high-water mark).
+    """
+    inspector = inspect(conn)
+    if not all(_table_current(inspector, table) for table in ROLLUP_TABLES + [RollupState.__table__]):
+        return 'full', None
+    last_sale_id = conn.scalar(select(RollupState.last_sale_id).where(RollupState.name == ROLLUP_STATE))
+    high_water = conn.scalar(select(func.max(Sale.id)))
+    if high_water is None or (last_sale_id is not None and high_water <= last_sale_id):
+        return None
+    if last_sale_id is None:
+        return 'full', None
+    pending = _first_date_after(conn, last_sale_id)
+    return ('since', pending) if pending is not None else ('undated', high_water)
+
+
+def ensure_sales_rollups(bind, conn=None):
+    """Create the summary tables if needed and catch up with sales added since the last refresh.
+
+    Sales above the recorded sales.id high-water mark are caught up from
+    their earliest date, so backdated rows written outside the importer are
+    included too. Editing or deleting existing sales directly in the
+    database needs a full refresh_sales_rollups(bind).
+
+    The up-to-date check runs on `conn` when given (e.g. a session's
+    connection, so a page view checks out no other); catching up runs in
+    its own transactions on `bind`. Returns True if the tables changed.
+    """
+    if conn is None:
+        with bind.connect() as conn:
+            needed = _catch_up_needed(conn)
+    else:
+        needed = _catch_up_needed(conn)
+    if needed is None:
+        return False
+    action, value = needed
+    if action == 'full':
+        refresh_sales_rollups(bind)
+    elif action == 'since':
+        refresh_sales_rollups(bind, since=value)
+    else:
+        # Only undated sales were added; they are not summarized
+        _ensure_state_row(bind)
+        with bind.begin() as conn:
+            _lock_refreshes(conn)
+            _set_high_water(conn, value)
+    return True
@@ -0,0 +1,127 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+SCENARIO_DRAWS = int(os.getenv("SCENARIO_DRAWS", "5000"))  # Monte Carlo draws per scenario
+SCENARIO_LOOKBACK_DAYS = 365  # baseline period taken from the sales rollup
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A what-if scenario; fractional changes, e.g. 0.05 = +5%.
+
+    Demand responds to the price change with constant elasticity
+    (units x (1 + price_change) ** price_elasticity) and is then scaled by the
+    marketing uplift and any per-region / per-channel adjustment. The
+    *_sd fields give the uncertainty that the Monte Carlo draws sample.
+    """
+    price_change: float = 0.0
+    price_elasticity: float = -1.2
+    marketing_uplift: float = 0.0
+    region_adjustments: Dict[str, float] = field(default_factory=dict)
+    channel_adjustments: Dict[str, float] = field(default_factory=dict)
+    elasticity_sd: float = 0.3
+    uplift_sd: float = 0.02
+    demand_noise_sd: float = 0.05  # independent demand shock per region x channel cell
+    draws: int = SCENARIO_DRAWS
+    seed: Optional[int] = 42
+
+
+# Scenarios offered before the engine took user-defined parameters
+SCENARIO_PRESETS = {
+    'price_increase': Scenario(price_change=0.10),
+    'marketing_boost': Scenario(marketing_uplift=0.15)
+}
+
+
+class ScenarioEngine:
+    """Monte Carlo scenario simulation over a region x channel sales cube.
+
+    `cube` has one row per (sales_region, sales_channel) with baseline
+    sales_amount and units_sold. All draws are evaluated as NumPy arrays of
+    shape (draws, cells); a grid of scenarios reuses the same random draws
+    (common random numbers) so neighbouring grid points are directly
+    comparable.
+    """
+
+    def __init__(self, cube):
+        self.cube = cube.reset_index(drop=True)
+        self.revenue = self.cube['sales_amount'].to_numpy(dtype='float64')
+        self.units = self.cube['units_sold'].to_numpy(dtype='float64')
+
+    @property
+    def baseline(self):
+        return {'revenue': float(self.revenue.sum()), 'units': float(self.units.sum())}
+
+    def _adjustment(self, scenario):
+        """Per-cell demand multiplier from the region and channel adjustments"""
+        region = self.cube['sales_region'].map(scenario.region_adjustments).fillna(0.0).to_numpy()
+        channel = self.cube['sales_channel'].map(scenario.channel_adjustments).fillna(0.0).to_numpy()
+        return (1 + region) * (1 + channel)
+
+    def _draws(self, scenario):
+        """Sampled elasticities (draws,), uplift shocks (draws,) and cell demand shocks (draws, cells)"""
+        rng = np.random.default_rng(scenario.seed)
+        elasticity = rng.normal(scenario.price_elasticity, scenario.elasticity_sd, scenario.draws)
+        uplift_shock = rng.normal(0.0, scenario.uplift_sd, scenario.draws)
+        # Mean-one lognormal shocks leave expected demand unchanged
+        sd = scenario.demand_noise_sd
+        noise = rng.lognormal(-sd ** 2 / 2, sd, (scenario.draws, len(self.cube)))
+        return elasticity, uplift_shock, noise
+
+    def simulate(self, scenario):
+        """Revenue and unit outcomes of one scenario with uncertainty bands"""
+        elasticity, uplift_shock, noise = self._draws(scenario)
+        price_factor = 1 + scenario.price_change
+        demand = (price_factor ** elasticity * (1 + scenario.marketing_uplift + uplift_shock))[:, None]
+        units = self.units * self._adjustment(scenario) * noise * demand
+        revenue = self.revenue * self._adjustment(scenario) * noise * demand * price_factor
+
+        total_revenue = revenue.sum(axis=1)
+        total_units = units.sum(axis=1)
+        baseline = self.baseline
+        by_region = (
+            pd.DataFrame({'sales_region': self.cube['sales_region'], 'revenue': revenue.mean(axis=0)})
+            .groupby('sales_region')['revenue'].sum()
+        )
+        return {
+            'baseline_revenue': baseline['revenue'],
+            'expected_revenue': float(total_revenue.mean()),
+            'revenue_p5': float(np.percentile(total_revenue, 5)),
+            'revenue_p95': float(np.percentile(total_revenue, 95)),
+            'revenue_change_pct': float(_pct_change(total_revenue.mean(), baseline['revenue'])),
+            'prob_revenue_increase': float((total_revenue > baseline['revenue']).mean()),
+            'baseline_units': baseline['units'],
+            'expected_units': float(total_units.mean()),
+            'units_change_pct': float(_pct_change(total_units.mean(), baseline['units'])),
+            'revenue_draws': total_revenue,
+            'revenue_by_region': by_region.to_dict()
+        }
+
+    def grid(self, scenario, price_changes, uplifts):
+        """Expected revenue change (%) and P(revenue up) for every price change x uplift pair.
+
+        The scenario's own price_change and marketing_uplift are replaced by
+        the grid values; everything else, including the random draws, is shared.
+        Returns two arrays of shape (len(price_changes), len(uplifts)).
+        """
+        elasticity, uplift_shock, noise = self._draws(scenario)
+        price_factor = 1 + np.asarray(price_changes, dtype='float64')[:, None, None]
+        uplift = 1 + np.asarray(uplifts, dtype='float64')[None, :, None] + uplift_shock
+        # Price and uplift act uniformly on all cells, so cells collapse to one total per draw
+        cell_revenue = (self.revenue * self._adjustment(scenario) * noise).sum(axis=1)
+        revenue = price_factor ** (1 + elasticity) * uplift * cell_revenue  # (prices, uplifts, draws)
+
+        baseline = self.baseline['revenue']
+        return (
+            _pct_change(revenue.mean(axis=2), baseline),
+            (revenue > baseline).mean(axis=2)
+        )
+
+
+def _pct_change(value, baseline):
+    return (value - baseline) / baseline * 100 if baseline else value * 0.0
+
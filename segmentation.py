@@ -0,0 +1,260 @@
+import os
+import copy
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, update, func, or_, exists
+
+from cache import result_cache
+from database import Customer
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_BATCH_SIZE = int(os.getenv("SEGMENT_BATCH_SIZE", "10000"))  # customers per partial_fit / UPDATE batch
+SEGMENT_MODEL_PATH = os.getenv("SEGMENT_MODEL_PATH", ".segmentation.joblib")
+
+SEGMENT_FEATURES = ['lifetime_value', 'purchases', 'satisfaction_score']
+# Feature -> column recording the value the current segment was assigned from
+SEGMENT_BASIS = {feature: f"segmented_{feature}" for feature in SEGMENT_FEATURES}
+# Value tiers, highest centroid lifetime value first
+SEGMENT_LABELS = ['high_value', 'medium_value', 'low_value', 'at_risk']
+
+
+class SegmentationService:
+    """Incrementally maintained K-means value tiers stored in customers.segment.
+
+    The first refresh streams all customers to fit a StandardScaler and a
+    MiniBatchKMeans model with partial_fit, then labels every customer.
+    Later refreshes only feed customers added since the last fit (by id) to
+    partial_fit, and label the customers that have no segment yet or whose
+    features changed since they were labelled (the segmented_* columns keep
+    the values each label was assigned from). Clusters are mapped to
+    SEGMENT_LABELS by descending centroid lifetime value, so a tier keeps
+    its name across refits. If a refit reorders the tiers, every customer is
+    relabelled on a background thread, and the result cache's customer
+    entries are invalidated when it finishes.
+
+    The fitted state is persisted with joblib at `path`, so only point it at a
+    location the app alone can write to.
+    """
+
+    def __init__(self, path=SEGMENT_MODEL_PATH, batch_size=SEGMENT_BATCH_SIZE, labels=SEGMENT_LABELS):
+        self.path = path
+        self.batch_size = batch_size
+        self.labels = list(labels)
+        self._state = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._relabel_thread = None
+        self._relabel_pending = False
+
+    def refresh(self, bind, relabel=False, conn=None):
+        """Bring the model and customers.segment up to date.
+
+        Returns the number of customers labelled before returning; a full
+        relabel after the tiers are reordered (or with relabel=True)
+        continues in the background. When `conn` is given (e.g. a session's
+        connection), it checks first whether there is anything to do, so an
+        up-to-date refresh checks out no other connection.
+        """
+        with self._lock:
+            state = self._load()
+            if state is not None and not relabel and conn is not None and self._up_to_date(conn, state):
+                return 0
+            if state is None:
+                state = self._fit(bind)
+                if state is None:
+                    return 0
+                self._save(state)
+                return self._assign(bind, state)
+            previous = state['tiers']
+            self._partial_fit(bind, state)
+            self._save(state)
+            if relabel or state['tiers'] != previous:
+                self._relabel_in_background(bind)
+            return self._assign(bind, state, where=self._stale())
+
+    def _up_to_date(self, conn, state):
+        """Whether no customer was added after the watermark or needs a new label"""
+        return not conn.scalar(select(exists().where(or_(Customer.id > state['watermark'], self._stale()))))
+
+    def _stale(self):
+        """Customers without a segment or whose features changed since they were labelled"""
+        return or_(Customer.segment.is_(None), *[
+            getattr(Customer, feature).is_distinct_from(getattr(Customer, basis))
+            for feature, basis in SEGMENT_BASIS.items()
+        ])
+
+    def _relabel_in_background(self, bind):
+        """Relabel every customer on a daemon thread; caller holds self._lock"""
+        self._relabel_pending = True
+        if self._relabel_thread is None:
+            self._relabel_thread = threading.Thread(
+                target=self._relabel_worker, args=(bind,), name='segment-relabel', daemon=True
+            )
+            self._relabel_thread.start()
+
+    def _relabel_worker(self, bind):
+        while True:
+            with self._lock:
+                if not self._relabel_pending or self._state is None:
+                    self._relabel_thread = None
+                    return
+                self._relabel_pending = False
+                # A private copy: refresh() keeps training the shared model meanwhile
+                state = copy.deepcopy(self._state)
+            try:
+                self._assign(bind, state)
+            except Exception:
+                logger.exception("Background segment relabel failed")
+            result_cache.invalidate('customers')
+
+    def segment_counts(self, conn):
+        """Customers per segment label, in tier order"""
+        rows = conn.execute(
+            select(Customer.segment, func.count(Customer.id))
+            .where(Customer.segment.is_not(None))
+            .group_by(Customer.segment)
+        ).all()
+        counts = dict(rows)
+        return {label: int(counts.get(label, 0)) for label in self.labels}
+
+    def _page(self, conn, after_id, where=None, for_update=False):
+        """(ids, feature matrix) of the next keyset page of customers after `after_id`"""
+        stmt = select(Customer.id, *[getattr(Customer, name) for name in SEGMENT_FEATURES])
+        if where is not None:
+            stmt = stmt.where(where)
+        stmt = stmt.where(Customer.id > after_id).order_by(Customer.id).limit(self.batch_size)
+        if for_update:
+            stmt = stmt.with_for_update()
+        frame = pd.DataFrame(conn.execute(stmt).all(), columns=['id'] + SEGMENT_FEATURES)
+        features = frame[SEGMENT_FEATURES].astype('float64').fillna(0.0).to_numpy()
+        return frame['id'].to_numpy(), features
+
+    def _batches(self, bind, after_id=0):
+        """Yield (ids, feature matrix) in id order, one keyset page at a time"""
+        last_id = after_id
+        while True:
+            with bind.connect() as conn:
+                ids, features = self._page(conn, last_id)
+            if not len(ids):
+                return
+            last_id = int(ids[-1])
+            yield ids, features
+
+    def _fit(self, bind):
+        """Fit scaler and clusters from scratch, streaming the table twice"""
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = StandardScaler()
+        watermark = 0
+        for ids, features in self._batches(bind):
+            scaler.partial_fit(features)
+            watermark = int(ids[-1])
+        if not hasattr(scaler, 'n_samples_seen_') or scaler.n_samples_seen_ < len(self.labels):
+            logger.info("Not enough customers to segment yet")
+            return None
+
+        state = {
+            'scaler': scaler,
+            'model': MiniBatchKMeans(n_clusters=len(self.labels), random_state=42, n_init=3),
+            'watermark': 0,
+            'tiers': None
+        }
+        self._partial_fit(bind, state, until=watermark)
+        return state
+
+    def _partial_fit(self, bind, state, until=None):
+        """Feed customers added after the watermark to the clustering model.
+
+        The scaler stays fixed after the initial fit so that existing centroids
+        keep their meaning. Batches smaller than the cluster count are carried
+        over because MiniBatchKMeans needs that many samples to initialise.
+        """
+        model = state['model']
+        pending_ids, pending = [], []
+        for ids, features in self._batches(bind, after_id=state['watermark']):
+            if until is not None and ids[0] > until:
+                break
+            pending_ids.append(ids)
+            pending.append(features)
+            if sum(len(batch) for batch in pending) < len(self.labels):
+                continue
+            model.partial_fit(state['scaler'].transform(np.vstack(pending)))
+            state['watermark'] = int(pending_ids[-1][-1])
+            pending_ids, pending = [], []
+
+        if hasattr(model, 'cluster_centers_'):
+            centroids = state['scaler'].inverse_transform(model.cluster_centers_)
+            ltv = centroids[:, SEGMENT_FEATURES.index('lifetime_value')]
+            # tiers[cluster] is the label index: highest centroid LTV gets label 0
+            state['tiers'] = np.argsort(np.argsort(-ltv)).tolist()
+
+    def _assign(self, bind, state, where=None):
+        """Label the customers matching `where` (all by default) in batches; return how many.
+
+        Each batch is read with FOR UPDATE and written in the same
+        transaction, so the segmented_* columns copied in the UPDATE are the
+        values the label was predicted from.
+        """
+        labels = np.array(self.labels)[state['tiers']]
+        basis = {column: getattr(Customer, feature) for feature, column in SEGMENT_BASIS.items()}
+        assigned, last_id = 0, 0
+        while True:
+            with bind.begin() as conn:
+                ids, features = self._page(conn, last_id, where=where, for_update=True)
+                if not len(ids):
+                    break
+                segments = labels[state['model'].predict(state['scaler'].transform(features))]
+                for label in np.unique(segments):
+                    conn.execute(
+                        update(Customer)
+                        .where(Customer.id.in_(ids[segments == label].tolist()))
+                        .values(segment=str(label), **basis)
+                    )
+            last_id = int(ids[-1])
+            assigned += len(ids)
+        if assigned:
+            logger.info(f"Assigned segments to {assigned} customers")
+        return assigned
+
+    def _load(self):
+        """Return the fitted state, reloading it if another process saved a newer one"""
+        if not self.path or not os.path.exists(self.path):
+            return self._state
+        mtime = os.path.getmtime(self.path)
+        if self._state is None or mtime != self._mtime:
+            import joblib
+            try:
+                state = joblib.load(self.path)
+                if len(state['tiers']) == len(self.labels):
+                    self._state, self._mtime = state, mtime
+            except Exception as e:
+                logger.warning(f"Discarding unreadable segmentation model {self.path}: {str(e)}")
+        return self._state
+
+    def _save(self, state):
+        self._state = state
+        if not self.path:
+            return
+        import joblib
+        try:
+            joblib.dump(state, f"{self.path}.tmp")
+            os.replace(f"{self.path}.tmp", self.path)
+            self._mtime = os.path.getmtime(self.path)
+        except Exception as e:
+            logger.warning(f"Could not persist segmentation model: {str(e)}")
+
+    def reset(self):
+        """Forget the fitted model so the next refresh refits from scratch"""
+        with self._lock:
+            self._state, self._mtime = None, None
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+# Process-wide service shared by all Streamlit sessions
+segmentation_service = SegmentationService()
@@ -0,0 +1,109 @@
+import threading
+import logging
+
+import numpy as np
+from sqlalchemy import select, func
+
+logger = logging.getLogger(__name__)
+
+SKETCH_COMPRESSION = 500  # t-digest delta; about delta/2 centroids are kept
+SKETCH_BATCH_SIZE = 50_000  # values fetched per keyset page when (re)building
+
+
+class TDigest:
+    """Mergeable t-digest for approximate quantiles of a numeric stream.
+
+    Values are folded into weighted centroids whose size is bounded by the
+    arcsine scale function, so centroids are small near the tails and the
+    median. Merging is vectorized: a batch is sorted together with the
+    existing centroids and grouped by integer k-scale bucket.
+    """
+
+    def __init__(self, compression=SKETCH_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._merge(np.concatenate([self.means, values]),
+                    np.concatenate([self.weights, np.ones(len(values))]))
+
+    def _merge(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        # k-scale position of each point's quantile midpoint
+        q = (cumulative - weights / 2) / cumulative[-1]
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        bucket = np.floor(k - k[0]).astype('int64')
+        starts = np.flatnonzero(np.r_[True, np.diff(bucket) != 0])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0-1); NaN when empty"""
+        if not self.count:
+            return float('nan')
+        positions = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(
+            q * self.count,
+            np.r_[0.0, positions, self.count],
+            np.r_[self.min, self.means, self.max]
+        ))
+
+
+class ColumnSketch:
+    """T-digest of a table column, kept current by id watermark.
+
+    refresh() only reads rows with an id above the last one folded in. When
+    the table's row count or sum no longer matches the digest (rows were
+    updated or deleted), the digest is rebuilt from scratch.
+    """
+
+    def __init__(self, column, id_column, compression=SKETCH_COMPRESSION, batch_size=SKETCH_BATCH_SIZE):
+        self.column = column
+        self.id_column = id_column
+        self.compression = compression
+        self.batch_size = batch_size
+        self.digest = TDigest(compression)
+        self.watermark = None
+        self._lock = threading.Lock()
+
+    def refresh(self, conn, count, total):
+        """Bring the digest up to date with the table's non-null (count, sum)"""
+        with self._lock:
+            self._ingest(conn)
+            if self.digest.count != count or not np.isclose(self.digest.total, total or 0.0, rtol=1e-9):
+                logger.info(f"Rebuilding quantile sketch for {self.column}")
+                self.digest, self.watermark = TDigest(self.compression), None
+                self._ingest(conn)
+            return self.digest
+
+    def _ingest(self, conn):
+        stmt = select(self.id_column, self.column).where(self.column.is_not(None))
+        while True:
+            page = stmt if self.watermark is None else stmt.where(self.id_column > self.watermark)
+            rows = conn.execute(page.order_by(self.id_column).limit(self.batch_size)).all()
+            if not rows:
+                return
+            ids, values = zip(*rows)
+            self.digest.update(values)
+            self.watermark = ids[-1]
+
+    def stats(self, conn):
+        """Count, mean and the digest, with count and mean computed in the database"""
+        count, total = conn.execute(select(func.count(self.column), func.sum(self.column))).one()
+        digest = self.refresh(conn, count, total)
+        return count, (total / count if count else float('nan')), digest
@@ -0,0 +1,53 @@
+from cache import ResultCache, cached, result_cache
+from database import Customer
+
+
+def test_invalidate_drops_only_entries_depending_on_the_tables():
+    cache = ResultCache(ttl=60, maxsize=8)
+    cache.set('sales_total', 1, tables=['sales'])
+    cache.set('customer_count', 2, tables=['customers'])
+    cache.set('revenue_per_customer', 3, tables=['sales', 'customers'])
+
+    cache.invalidate('sales')
+
+    assert cache.get('sales_total') == (None, False)
+    assert cache.get('revenue_per_customer') == (None, False)
+    assert cache.get('customer_count') == (2, True)
+
+
+def test_entries_expire_and_least_recently_used_is_evicted():
+    cache = ResultCache(ttl=60, maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') == (None, False)
+    assert cache.get('a') == (1, True)
+
+    cache.set('stale', 4, ttl=-1)
+    assert cache.get('stale') == (None, False)
+
+
+def test_cached_method_is_invalidated_by_a_committed_session_write(session):
+    result_cache.clear()
+
+    class Report:
+        def __init__(self, session):
+            self.session = session
+
+        @cached('customers')
+        def customer_count(self):
+            return self.session.query(Customer).count()
+
+    report = Report(session)
+    assert report.customer_count() == 0
+    session.add(Customer(first_name='Ada', email='ada@example.com'))
+    session.flush()
+    assert report.customer_count() == 0  # not committed yet, cached value stands
+    session.commit()
+    assert report.customer_count() == 1
+
+    session.add(Customer(first_name='Bob', email='bob@example.com'))
+    session.flush()
+    session.rollback()
+    assert report.customer_count() == 1
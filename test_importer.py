@@ -0,0 +1,46 @@
+import io
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from database import Sale, Motorcycle
+from importer import CSVImporter
+
+
+def test_import_coerces_values_to_column_types(engine):
+    csv = io.StringIO(
+        "date,sales_amount,units_sold,sales_region,unknown\n"
+        "2024-01-02,100.5,2,North,x\n"
+        "not a date,abc,1.0,South,y\n"
+        "2024-01-01,,,,z\n"
+    )
+
+    result = CSVImporter(engine, chunksize=2).import_file(csv, 'sales')
+
+    assert result.rows == 3
+    assert result.first_date == date(2024, 1, 1)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(Sale.date, Sale.sales_amount, Sale.units_sold, Sale.sales_region).order_by(Sale.id)
+        ).all()
+    assert [tuple(row) for row in rows] == [
+        (date(2024, 1, 2), 100.5, 2, 'North'),
+        (None, None, 1, 'South'),
+        (date(2024, 1, 1), None, None, None)
+    ]
+
+
+def test_import_parses_json_columns_and_drops_invalid_json(engine):
+    csv = io.StringIO('brand,specifications\nA,"{""abs"": true}"\nB,{not json\n')
+
+    CSVImporter(engine).import_file(csv, 'motorcycles')
+
+    with engine.connect() as conn:
+        values = conn.execute(select(Motorcycle.specifications).order_by(Motorcycle.id)).scalars().all()
+    assert values == [{'abs': True}, None]
+
+
+def test_import_rejects_unknown_table(engine):
+    with pytest.raises(ValueError):
+        CSVImporter(engine).import_file(io.StringIO("a\n1\n"), 'users')
@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import jobs
+from jobs import ForecastJobRunner
+
+
+class ManualExecutor:
+    """Stands in for the process pool; tests complete the futures themselves"""
+
+    def __init__(self):
+        self.futures = []
+        self._processes = {}
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def _runner(tmp_path, monkeypatch):
+    executors = []
+
+    def new_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ManualExecutor()
+                executors.append(self._executor)
+            return self._executor
+
+    monkeypatch.setattr(ForecastJobRunner, '_get_executor', new_executor)
+    return ForecastJobRunner(max_workers=1, job_dir=str(tmp_path)), executors
+
+
+def test_identical_running_requests_share_a_job_until_it_finishes(tmp_path, monkeypatch):
+    runner, executors = _runner(tmp_path, monkeypatch)
+    job_id = runner.submit(30, 'arima')
+    assert runner.submit(30, 'arima') == job_id
+    assert runner.submit(60, 'arima') != job_id
+    assert runner.get(job_id)['status'] == 'running'
+
+    executors[0].futures[0].set_result({'dates': ['2024-01-01']})
+
+    record = runner.get(job_id)
+    assert record['status'] == 'done'
+    assert record['result'] == {'dates': ['2024-01-01']}
+    assert runner.submit(30, 'arima') != job_id
+
+
+def test_job_is_resubmitted_once_when_its_worker_dies(tmp_path, monkeypatch):
+    runner, executors = _runner(tmp_path, monkeypatch)
+    job_id = runner.submit(30, 'arima')
+
+    executors[0].futures[0].set_exception(BrokenProcessPool())
+    assert len(executors) == 2
+    assert runner.get(job_id)['status'] == 'running'
+
+    executors[1].futures[0].set_exception(BrokenProcessPool())
+    record = runner.get(job_id)
+    assert record['status'] == 'failed'
+    assert 'stopped unexpectedly' in record['error']
+
+
+def test_failed_forecast_and_timeout_are_recorded(tmp_path, monkeypatch):
+    runner, executors = _runner(tmp_path, monkeypatch)
+    failing = runner.submit(30, 'arima')
+    executors[0].futures[0].set_exception(ValueError("not enough data"))
+    assert runner.get(failing)['error'] == "not enough data"
+
+    slow = runner.submit(30, 'prophet')
+    monkeypatch.setattr(jobs, 'FORECAST_JOB_TIMEOUT', 0.01)
+    time.sleep(0.05)
+    record = runner.get(slow)
+    assert record['status'] == 'failed'
+    assert record['error'] == 'Forecast job timed out'
+
+    # A result arriving after the timeout does not overwrite the record
+    executors[0].futures[1].set_result({'dates': []})
+    assert runner.get(slow)['status'] == 'failed'
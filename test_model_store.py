@@ -0,0 +1,68 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+import pandas as pd
+
+
+def _forecast_in_fresh_process(periods):
+    """Run a forecast job the way a forecast worker does; return the model types that were fitted"""
+    from model_store import model_store
+    from jobs import run_forecast
+
+    fitted = []
+    get_or_fit = model_store.get_or_fit
+
+    def recording_get_or_fit(model_type, df, params, fit):
+        return get_or_fit(model_type, df, params, lambda: fitted.append(model_type) or fit())
+
+    model_store.get_or_fit = recording_get_or_fit
+    forecast = run_forecast(periods, 'arima', None, 'D')
+    return fitted, len(forecast['dates'])
+
+
+def test_forecast_worker_reuses_model_fitted_by_another_process(engine, tmp_path, monkeypatch):
+    from data_generator import populate_database
+
+    populate_database(n_motorcycles=20, n_customers=50, n_sales=400, seed=1, bind=engine)
+    engine.dispose()
+    monkeypatch.setenv('DATABASE_URL', engine.url.render_as_string(hide_password=False))
+    monkeypatch.setenv('FORECAST_MODEL_DIR', str(tmp_path / 'models'))
+
+    # A fresh spawned process per call, like a request landing on another forecast worker
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as executor:
+        assert executor.submit(_forecast_in_fresh_process, 30).result() == (['arima'], 30)
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as executor:
+        assert executor.submit(_forecast_in_fresh_process, 60).result() == ([], 60)
+
+
+def test_store_reuses_fit_across_horizons_and_evicts_least_recently_used():
+    from model_store import ModelStore
+
+    store = ModelStore(maxsize=2, directory=None)
+    df = pd.DataFrame({'ds': pd.date_range('2024-01-01', periods=5), 'y': range(5)})
+    fits = []
+
+    def fit(name):
+        return lambda: fits.append(name) or name
+
+    assert store.get_or_fit('arima', df, {'order': 1}, fit('a')) == 'a'
+    assert store.get_or_fit('arima', df, {'order': 1}, fit('again')) == 'a'
+    store.get_or_fit('arima', df, {'order': 2}, fit('b'))
+    store.get_or_fit('arima', df.iloc[:4], {'order': 1}, fit('c'))
+    store.get_or_fit('arima', df, {'order': 1}, fit('refit'))
+    assert fits == ['a', 'b', 'c', 'refit']
+
+
+def test_store_reloads_from_disk_and_prunes_beyond_disk_limit(tmp_path):
+    from model_store import ModelStore
+
+    df = pd.DataFrame({'ds': pd.date_range('2024-01-01', periods=5), 'y': range(5)})
+    writer = ModelStore(directory=str(tmp_path), disk_limit=2)
+    for order in range(3):
+        writer.get_or_fit('arima', df, {'order': order}, lambda order=order: {'order': order})
+    assert len(list(tmp_path.iterdir())) == 2
+
+    reader = ModelStore(directory=str(tmp_path), disk_limit=2)
+    assert reader.get_or_fit('arima', df, {'order': 2}, lambda: pytest.fail("refitted")) == {'order': 2}
@@ -0,0 +1,93 @@
+from datetime import date
+
+from sqlalchemy import select, func
+
+from database import Sale, SalesDaily, SalesRollup, RollupState
+from rollups import ROLLUP_STATE, refresh_sales_rollups, ensure_sales_rollups
+
+
+def _add_sales(engine, *sales):
+    with engine.begin() as conn:
+        conn.execute(Sale.__table__.insert(), [
+            dict(date=day, sales_amount=amount, units_sold=1, customer_satisfaction=4.0,
+                 sales_channel='Online', promotion_applied='None', sales_region=region)
+            for day, amount, region in sales
+        ])
+
+
+def _daily(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(SalesDaily.date, SalesDaily.sales_amount)).all())
+
+
+def _high_water(engine):
+    with engine.connect() as conn:
+        return conn.scalar(select(RollupState.last_sale_id).where(RollupState.name == ROLLUP_STATE))
+
+
+def test_refresh_materializes_daily_totals_of_dated_sales(engine):
+    _add_sales(engine, (date(2024, 1, 1), 100.0, 'North'), (date(2024, 1, 1), 50.0, 'South'),
+               (date(2024, 1, 2), 20.0, 'North'), (None, 999.0, 'North'))
+
+    refresh_sales_rollups(engine)
+    refresh_sales_rollups(engine)
+
+    assert _daily(engine) == {date(2024, 1, 1): 150.0, date(2024, 1, 2): 20.0}
+
+
+def test_refresh_since_reaggregates_only_later_days(engine):
+    _add_sales(engine, (date(2024, 1, 1), 10.0, 'North'), (date(2024, 1, 2), 20.0, 'North'))
+    refresh_sales_rollups(engine)
+
+    _add_sales(engine, (date(2024, 1, 2), 5.0, 'North'))
+    refresh_sales_rollups(engine, since=date(2024, 1, 2))
+
+    assert _daily(engine) == {date(2024, 1, 1): 10.0, date(2024, 1, 2): 25.0}
+
+
+def test_full_refresh_fills_rollup_and_records_high_water_mark(engine):
+    _add_sales(engine, (date(2024, 1, 1), 100.0, 'North'), (date(2024, 1, 1), 50.0, 'South'),
+               (date(2024, 1, 2), 20.0, 'North'), (None, 999.0, 'North'))
+
+    refresh_sales_rollups(engine)
+
+    assert _daily(engine) == {date(2024, 1, 1): 150.0, date(2024, 1, 2): 20.0}
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(SalesRollup)) == 3
+    assert _high_water(engine) == 4
+
+
+def test_ensure_catches_up_backdated_sales_without_duplicating_rows(engine):
+    _add_sales(engine, (date(2024, 1, 5), 10.0, 'North'), (date(2024, 1, 6), 20.0, 'North'))
+    ensure_sales_rollups(engine)
+
+    # Written outside the importer and dated before the newest summarized day
+    _add_sales(engine, (date(2024, 1, 3), 5.0, 'North'), (date(2024, 1, 5), 1.0, 'North'))
+    ensure_sales_rollups(engine)
+    ensure_sales_rollups(engine)
+
+    assert _daily(engine) == {date(2024, 1, 3): 5.0, date(2024, 1, 5): 11.0, date(2024, 1, 6): 20.0}
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(SalesRollup)) == 3
+    assert _high_water(engine) == 4
+
+
+def test_refresh_since_is_moved_back_to_pending_sales(engine):
+    _add_sales(engine, (date(2024, 1, 1), 10.0, 'North'))
+    refresh_sales_rollups(engine)
+
+    _add_sales(engine, (date(2024, 1, 1), 5.0, 'North'), (date(2024, 2, 1), 7.0, 'North'))
+    refresh_sales_rollups(engine, since=date(2024, 2, 1))
+
+    assert _daily(engine) == {date(2024, 1, 1): 15.0, date(2024, 2, 1): 7.0}
+
+
+def test_only_undated_sales_advance_the_high_water_mark(engine):
+    _add_sales(engine, (date(2024, 1, 1), 10.0, 'North'))
+    ensure_sales_rollups(engine)
+
+    _add_sales(engine, (None, 5.0, 'North'))
+    ensure_sales_rollups(engine)
+
+    assert _daily(engine) == {date(2024, 1, 1): 10.0}
+    assert _high_water(engine) == 2
@@ -0,0 +1,27 @@
+import numpy as np
+
+from sketches import TDigest
+
+
+def test_tdigest_quantiles_track_exact_quantiles():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(mean=8, sigma=1, size=200_000)
+    digest = TDigest(compression=200)
+    for batch in np.array_split(values, 20):
+        digest.update(batch)
+
+    assert digest.count == len(values)
+    assert len(digest.means) < 200
+    assert digest.quantile(0) == values.min()
+    assert digest.quantile(1) == values.max()
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        exact = np.quantile(values, q)
+        assert abs(digest.quantile(q) - exact) / exact < 0.02
+
+
+def test_tdigest_ignores_nan_and_reports_nan_when_empty():
+    digest = TDigest()
+    assert np.isnan(digest.quantile(0.5))
+    digest.update([np.nan, 3.0, np.nan])
+    assert digest.count == 1
+    assert digest.quantile(0.5) == 3.0
@@ -0,0 +1,50 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from database import Sale
+from utils import lttb_indices, stream_table_csv, ExportTooLarge
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[437] = 25.0
+    y[812] = -25.0
+
+    kept = lttb_indices(x, y, 50)
+
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+    assert 437 in kept and 812 in kept
+
+
+def test_lttb_returns_every_index_when_nothing_to_drop():
+    assert lttb_indices(np.arange(10), np.arange(10), 20).tolist() == list(range(10))
+    assert lttb_indices(np.arange(10), np.arange(10), 2).tolist() == list(range(10))
+
+
+def test_oversized_gzip_export_closes_the_gzip_file_and_spool(engine, monkeypatch):
+    with engine.begin() as conn:
+        # Random text doesn't compress, so the size cap trips while rows are still being written
+        regions = np.random.default_rng(0).bytes(64 * 2000).hex()
+        conn.execute(Sale.__table__.insert(), [
+            {'sales_region': regions[i * 128:(i + 1) * 128]} for i in range(2000)
+        ])
+    opened = []
+
+    class RecordingGzipFile(gzip.GzipFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(gzip, 'GzipFile', RecordingGzipFile)
+
+    with pytest.raises(ExportTooLarge):
+        stream_table_csv(engine, 'sales', compress=True, chunksize=100, max_bytes=20_000)
+
+    [gzip_file] = opened
+    assert gzip_file.closed
+    assert gzip_file.fileobj is None  # GzipFile.close drops its reference to the spool
@@ -1,5 +1,5 @@
 import pymysql
-import bcrypt
+from auth import hash_password
 
 # Database connection details
 connection = pymysql.connect(
@@ -17,7 +17,7 @@ def update_password(username, new_password):
     try:
         cursor = connection.cursor()
         # Rehash the password
-        new_hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        new_hashed_password = hash_password(new_password)
         # Update the user's password
         cursor.execute('UPDATE users SET hashed_password = %s WHERE username = %s', (new_hashed_password, username))
         connection.commit()
@@ -1,17 +1,103 @@
+import io
+import os
+import csv
+import gzip
+import json
+import tempfile
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+from sqlalchemy import select, JSON
+from importer import IMPORT_TABLES
+from profiling import profiled
 
-def create_sales_trend_chart(sales_df):
-    fig = px.line(
-        sales_df,
-        x='date',
-        y='sales_amount',
-        title='Sales Trend Over Time'
-    )
+EXPORT_CHUNKSIZE = int(os.getenv("EXPORT_CHUNKSIZE", "50000"))  # rows fetched per round trip
+EXPORT_SPOOL_SIZE = int(os.getenv("EXPORT_SPOOL_SIZE", str(32 * 1024 * 1024)))  # bytes kept in memory before spilling to disk
+# Largest file offered as a browser download; Streamlit holds each download in server memory
+EXPORT_MAX_BYTES = int(os.getenv("EXPORT_MAX_BYTES", str(100 * 1024 * 1024)))
+
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1000"))  # points sent to the browser per series
+CHART_WEBGL_THRESHOLD = int(os.getenv("CHART_WEBGL_THRESHOLD", "5000"))
+# Aggregation levels tried in order: (resample rule, label, approximate days per bucket)
+CHART_FREQUENCIES = [
+    ('D', 'daily totals', 1),
+    ('W-SUN', 'weekly totals', 7),
+    ('MS', 'monthly totals', 30.4),
+    ('QS', 'quarterly totals', 91.3),
+    ('YS', 'yearly totals', 365.25)
+]
+
+def lttb_indices(x, y, n_out):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from each of n_out - 2 equal buckets,
+    the point forming the largest triangle with the previously kept point and
+    the next bucket's average, which preserves peaks and troughs.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, n_out - 1).astype('int64')
+    kept = np.empty(n_out, dtype='int64')
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        following = slice(end, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        avg_x, avg_y = x[following].mean(), y[following].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
+
+def prepare_time_series(df, x='date', y='sales_amount', max_points=CHART_MAX_POINTS):
+    """Reduce a time series to at most max_points for plotting; return (frame, resolution label).
+
+    Rows sharing a timestamp (e.g. individual sales) are summed at the finest
+    calendar frequency that fits in max_points. A series with one row per
+    timestamp that is still too long is downsampled with LTTB, which keeps
+    its scale and its peaks.
+    """
+    data = df[[x, y]].dropna()
+    data = data.assign(**{x: pd.to_datetime(data[x])}).sort_values(x, kind='stable')
+    resolution = None
+    if data[x].duplicated().any():
+        span_days = max((data[x].max() - data[x].min()).days, 0) if len(data) else 0
+        for freq, label, days_per_bucket in CHART_FREQUENCIES:
+            if span_days / days_per_bucket <= max_points:
+                break
+        data = data.set_index(x)[y].resample(freq).sum().reset_index()
+        resolution = label
+    if len(data) > max_points:
+        keep = lttb_indices(data[x].astype('int64'), data[y], max_points)
+        data = data.iloc[keep]
+        resolution = f"{resolution}, downsampled" if resolution else "downsampled"
+    return data.reset_index(drop=True), resolution
+
+@profiled('figure')
+def create_sales_trend_chart(sales_df, max_points=CHART_MAX_POINTS, webgl=None):
+    """Line chart of sales over time with a bounded number of points.
+
+    webgl=None switches to Scattergl when more than CHART_WEBGL_THRESHOLD
+    points remain after reduction.
+    """
+    data, resolution = prepare_time_series(sales_df, 'date', 'sales_amount', max_points)
+    if webgl is None:
+        webgl = len(data) > CHART_WEBGL_THRESHOLD
+    trace = go.Scattergl if webgl else go.Scatter
+    title = 'Sales Trend Over Time' + (f' ({resolution})' if resolution else '')
+    fig = go.Figure(trace(x=data['date'], y=data['sales_amount'], mode='lines', name='sales_amount'))
+    fig.update_layout(title=title, xaxis_title='date', yaxis_title='sales_amount')
     return fig
 
+@profiled('figure')
 def create_inventory_pie_chart(inventory_df):
     brand_distribution = inventory_df['brand'].value_counts()
     fig = px.pie(
@@ -21,6 +107,7 @@ def create_inventory_pie_chart(inventory_df):
     )
     return fig
 
+@profiled('figure')
 def create_customer_satisfaction_gauge(customer_df):
     avg_satisfaction = customer_df['satisfaction_score'].mean()
     fig = go.Figure(go.Indicator(
@@ -43,3 +130,62 @@ def create_customer_satisfaction_gauge(customer_df):
 
 def export_to_csv(df, filename):
     return df.to_csv(index=False).encode('utf-8')
+
+class ExportTooLarge(Exception):
+    """An export grew past the size that can be offered as a download"""
+
+
+def stream_table_csv(bind, table_name, compress=False, chunksize=EXPORT_CHUNKSIZE, max_bytes=None):
+    """Write a whole table as CSV (optionally gzip) to a spooled temp file, chunk by chunk.
+
+    Rows are fetched through a server-side cursor, so memory use is bounded
+    by the chunk size and EXPORT_SPOOL_SIZE however large the table is. JSON
+    columns are written as JSON text, which CSVImporter reads back. Raises
+    ExportTooLarge as soon as the file passes `max_bytes`. Returns the file
+    rewound to the start; the caller closes it.
+    """
+    if table_name not in IMPORT_TABLES:
+        raise ValueError(f"Unknown table: {table_name}")
+    table = IMPORT_TABLES[table_name]
+    json_positions = [i for i, column in enumerate(table.columns) if isinstance(column.type, JSON)]
+
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    raw = gzip.GzipFile(fileobj=spool, mode='wb', compresslevel=6) if compress else spool
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow([column.name for column in table.columns])
+    try:
+        with bind.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(select(table))
+            for rows in result.partitions(chunksize):
+                if json_positions:
+                    rows = [_dump_json_values(row, json_positions) for row in rows]
+                writer.writerows(rows)
+                # One encode and write per chunk; the buffer never holds more than a chunk
+                raw.write(buffer.getvalue().encode('utf-8'))
+                buffer.seek(0)
+                buffer.truncate()
+                _check_export_size(spool, table_name, max_bytes)
+        raw.write(buffer.getvalue().encode('utf-8'))
+        if compress:
+            raw.close()  # writes the gzip trailer; the spooled file stays open
+        _check_export_size(spool, table_name, max_bytes)
+    except Exception:
+        # Close the gzip wrapper before the file under it
+        if compress:
+            raw.close()
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+def _check_export_size(spool, table_name, max_bytes):
+    if max_bytes is not None and spool.tell() > max_bytes:
+        raise ExportTooLarge(f"The {table_name} export is larger than {max_bytes:,} bytes")
+
+def _dump_json_values(row, positions):
+    row = list(row)
+    for i in positions:
+        if row[i] is not None:
+            row[i] = json.dumps(row[i])
+    return row
@@ -1,4 +1,7 @@
 -- Drop tables if they exist (to allow re-creation)
+DROP TABLE IF EXISTS sales_daily;
+DROP TABLE IF EXISTS sales_rollup;
+DROP TABLE IF EXISTS rollup_state;
 DROP TABLE IF EXISTS sales;
 DROP TABLE IF EXISTS motorcycles;
 DROP TABLE IF EXISTS customers;
@@ -39,7 +42,12 @@ CREATE TABLE customers (
     phone VARCHAR(255),
     lifetime_value FLOAT,
     purchases INTEGER,
-    satisfaction_score FLOAT
+    satisfaction_score FLOAT,
+    segment VARCHAR(32),
+    segmented_lifetime_value FLOAT,
+    segmented_purchases INTEGER,
+    segmented_satisfaction_score FLOAT,
+    churn_risk_score FLOAT
 );
 
 
@@ -60,6 +68,8 @@ CREATE TABLE customers (
 
 
 CREATE INDEX ix_customers_id ON customers(id);
+CREATE INDEX ix_customers_segment ON customers(segment);
+CREATE INDEX ix_customers_lifetime_value ON customers(lifetime_value);
 
 
 -- Table: sales
@@ -78,6 +88,10 @@ CREATE TABLE sales (
 );
 
 CREATE INDEX ix_sales_id ON sales(id);
+CREATE INDEX ix_sales_date ON sales(date);
+CREATE INDEX ix_sales_customer_id_date ON sales(customer_id, date);
+CREATE INDEX ix_sales_motorcycle_id ON sales(motorcycle_id);
+CREATE INDEX ix_sales_region_date ON sales(sales_region, date);
 
 -- Table: market_data
 CREATE TABLE market_data (
@@ -92,3 +106,34 @@ CREATE TABLE market_data (
 );
 
 CREATE INDEX ix_market_data_id ON market_data(id);
+
+-- Table: sales_daily (daily totals materialized from sales, see rollups.py)
+CREATE TABLE sales_daily (
+    date DATE PRIMARY KEY,
+    sales_amount FLOAT,
+    units_sold INTEGER,
+    transactions INTEGER
+);
+
+-- Table: sales_rollup (totals per day, region, channel and promotion, see rollups.py)
+CREATE TABLE sales_rollup (
+    id INTEGER PRIMARY KEY,
+    date DATE,
+    sales_region VARCHAR(255),
+    sales_channel VARCHAR(255),
+    promotion_applied VARCHAR(255),
+    sales_amount FLOAT,
+    units_sold INTEGER,
+    transactions INTEGER,
+    satisfaction_total FLOAT
+);
+
+CREATE INDEX ix_sales_rollup_date ON sales_rollup(date);
+CREATE UNIQUE INDEX ux_sales_rollup_key ON sales_rollup(date, sales_region, sales_channel, promotion_applied);
+
+-- Table: rollup_state (refresh lock and sales.id high-water mark, see rollups.py)
+CREATE TABLE rollup_state (
+    name VARCHAR(64) PRIMARY KEY,
+    refreshed_at DATETIME,
+    last_sale_id INTEGER
+);